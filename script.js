@@ -8,6 +8,14 @@ class ZhuyinFlashcards {
         this.audioBasePath = 'zhuyin_audios/';
         this.currentAudio = null;
         
+        // Asset index (audio_index.json written by zhuyin_audio_generator.py)
+        this.assetIndex = null;
+        
+        // Audio sprites (generated with zhuyin_audio_generator.py --sprites)
+        this.spriteIndex = null;
+        this.spriteBuffers = new Map();
+        this.spriteClipUrls = new Map();
+        
         // Expanded overlay state
         this.expandedCard = null;
         this.isExpandedFlipped = false;
@@ -25,6 +33,8 @@ class ZhuyinFlashcards {
     async init() {
         try {
             await this.loadData();
+            await Promise.all([this.loadAssetIndex(), this.loadSpriteIndex()]);
+            this.registerServiceWorker();
             this.setupEventListeners();
             this.setupCards();
             this.hideLoading();
@@ -48,6 +58,41 @@ class ZhuyinFlashcards {
         }
     }
 
+    registerServiceWorker() {
+        // Optional offline precache (sw.js generated with zhuyin_audio_generator.py --service-worker)
+        if (!('serviceWorker' in navigator) || location.protocol === 'file:') {
+            return;
+        }
+        navigator.serviceWorker.register('sw.js').catch(error => {
+            console.info('Offline precache not available', error);
+        });
+    }
+
+    async loadAssetIndex() {
+        // Optional: without the index audio paths are derived with sanitizeFilename
+        try {
+            const response = await fetch(`${this.audioBasePath}audio_index.json`, { cache: 'no-cache' });
+            if (response.ok) {
+                this.assetIndex = await response.json();
+            }
+        } catch (error) {
+            console.info('Audio index not available, deriving audio paths');
+        }
+    }
+
+    async loadSpriteIndex() {
+        // Optional: without sprites every clip is fetched as its own file
+        try {
+            // Always revalidate: offsets must match the sprite bytes of the same pack
+            const response = await fetch(`${this.audioBasePath}sprites/sprites.json`, { cache: 'no-cache' });
+            if (response.ok) {
+                this.spriteIndex = await response.json();
+            }
+        } catch (error) {
+            console.info('Audio sprites not available, using individual files');
+        }
+    }
+
     setupEventListeners() {
         // Card navigation
         document.getElementById('prevCard').addEventListener('click', () => this.previousCard());
@@ -1022,17 +1067,38 @@ class ZhuyinFlashcards {
     }
 
     playIndividualWordAudio(characters, pinyin) {
-        const audioPath = `${this.audioBasePath}individual_words/${this.sanitizeFilename(characters)}_${pinyin}.mp3`;
+        const indexed = this.assetIndex && this.assetIndex.words[`${characters}|${pinyin}`];
+        const audioPath = indexed
+            ? `${this.audioBasePath}${indexed}`
+            : `${this.audioBasePath}individual_words/${this.sanitizeFilename(characters)}_${pinyin}.mp3`;
         this.playAudio(audioPath);
     }
 
+    getIndexedAudioPath(card, kind) {
+        // O(1) lookup in the asset index; null when the index or the clip is missing
+        if (!this.assetIndex) {
+            return null;
+        }
+        const cardId = card.type === 'tones' ? `tones/${card.tone_number}` : `${card.type}/${card.zhuyin}`;
+        const paths = this.assetIndex.cards[cardId];
+        return paths && paths[kind] ? `${this.audioBasePath}${paths[kind]}` : null;
+    }
+
     getZhuyinSoundPath(card) {
         // For individual zhuyin character sound
+        const indexed = this.getIndexedAudioPath(card, 'sound');
+        if (indexed) {
+            return indexed;
+        }
         let pinyinClean = card.pinyin.split(' ')[0]; // In case it has spaces
         return `${this.audioBasePath}zhuyin_sounds/${this.sanitizeFilename(card.zhuyin)}_${pinyinClean}.mp3`;
     }
 
     getWordAudioPath(card) {
+        const indexed = this.getIndexedAudioPath(card, 'word');
+        if (indexed) {
+            return indexed;
+        }
         const word = card.example_word;
         
         if (card.type === 'tones') {
@@ -1044,24 +1110,80 @@ class ZhuyinFlashcards {
     }
 
     getToneExampleAudioPath(card) {
+        const indexed = this.getIndexedAudioPath(card, 'word');
+        if (indexed) {
+            return indexed;
+        }
         const word = card.example_word;
         return `${this.audioBasePath}tones/examples/tono_${card.tone_number}_${this.sanitizeFilename(word.characters)}_${word.pinyin}.mp3`;
     }
 
     getSentenceAudioPath(card) {
+        const indexed = this.getIndexedAudioPath(card, 'sentence');
+        if (indexed) {
+            return indexed;
+        }
         const sentence = card.example_sentence;
         const category = `${card.type}/sentences`;
         const truncatedSentence = sentence.characters.substring(0, 10);
         return `${this.audioBasePath}${category}/${this.sanitizeFilename(card.zhuyin)}_${this.sanitizeFilename(truncatedSentence)}.mp3`;
     }
 
+    getVersionedUrl(audioPath) {
+        // Content hash as a cache-busting query so clips can be cached as immutable
+        const key = audioPath.substring(this.audioBasePath.length);
+        const asset = this.assetIndex && this.assetIndex.assets[key];
+        return asset ? `${audioPath}?v=${asset.hash}` : audioPath;
+    }
+
+    async resolveAudioSource(audioPath) {
+        // Returns an object URL for the clip inside its sprite, or the (versioned) file path
+        if (!audioPath.startsWith(this.audioBasePath)) {
+            return audioPath;
+        }
+        const key = audioPath.substring(this.audioBasePath.length);
+        const clip = this.spriteIndex && this.spriteIndex.clips[key];
+        if (!clip) {
+            return this.getVersionedUrl(audioPath);
+        }
+        if (this.spriteClipUrls.has(key)) {
+            return this.spriteClipUrls.get(key);
+        }
+        
+        try {
+            const sprite = this.spriteIndex.sprites[clip.sprite];
+            if (!this.spriteBuffers.has(clip.sprite)) {
+                // One request per category; concurrent plays share the same download
+                // Versioned like the clips, so a repacked sprite never reuses stale cached bytes
+                const url = `${this.audioBasePath}${sprite.file}?v=${sprite.signature.slice(0, 16)}`;
+                const download = fetch(url).then(response => {
+                    if (!response.ok) {
+                        throw new Error(`HTTP error! status: ${response.status}`);
+                    }
+                    return response.arrayBuffer();
+                });
+                this.spriteBuffers.set(clip.sprite, download);
+            }
+            const buffer = await this.spriteBuffers.get(clip.sprite);
+            const blob = new Blob([buffer.slice(clip.offset, clip.offset + clip.length)], { type: 'audio/mpeg' });
+            const url = URL.createObjectURL(blob);
+            this.spriteClipUrls.set(key, url);
+            return url;
+        } catch (error) {
+            console.warn(`Could not load audio sprite for ${key}, using individual file`, error);
+            this.spriteBuffers.delete(clip.sprite);
+            return this.getVersionedUrl(audioPath);
+        }
+    }
+
     async playAudio(audioPath, buttonId = null) {
         try {
             // Stop any currently playing audio
             this.stopCurrentAudio();
             
-            // Create new audio instance
-            this.currentAudio = new Audio(audioPath);
+            // Create new audio instance (from the category sprite when available)
+            const source = await this.resolveAudioSource(audioPath);
+            this.currentAudio = new Audio(source);
             
             // Add button visual feedback
             if (buttonId) {
@@ -8,14 +8,2033 @@ usando Google Text-to-Speech (gTTS)
 CORRECCIÓN FINAL: Usa vocales apropiadas para consonantes que no funcionan con ㄚ
 """
 
+import base64
+import glob
+import hashlib
+import importlib.util
+import io
+import itertools
 import json
+import mmap
 import os
+import random
 import time
 import re
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager, redirect_stdout
 from pathlib import Path
-from typing import Dict, List, Any
-import requests
-from gtts import gTTS
+from typing import Dict, List, Any, Optional
+
+# requests, gtts, aiohttp y asyncio se importan al usarse: los modos que solo
+# leen el mazo o el árbol de salida no pagan su carga (ver --profile)
+
+try:
+    import ijson  # Opcional: lectura en streaming de mazos .json grandes
+except ImportError:
+    ijson = None
+
+# Latencia media estimada de una llamada a gTTS (segundos), usada por --plan
+ESTIMATED_SYNTHESIS_LATENCY = 0.6
+
+# Caché de síntesis persistente (fuera de output_dir para sobrevivir a --clean)
+DEFAULT_CACHE_DIR = ".tts_cache"
+DEFAULT_CACHE_MAX_MB = 500
+# Al superar el límite se desaloja hasta este porcentaje, para no podar en cada put
+CACHE_PRUNE_LOW_WATER = 0.9
+
+# Lockfile de generación: clip -> hash del texto y parámetros TTS
+LOCKFILE_NAME = "audio_lock.json"
+
+# Diario de trabajos (JSON lines, solo se añade) usado por --resume
+JOURNAL_NAME = "generation_journal.jsonl"
+
+# Sprites de audio: un MP3 por categoría más un índice de desplazamientos
+SPRITES_DIR = "sprites"
+SPRITE_INDEX_NAME = "sprites.json"
+
+# Inventario completo de sílabas × tonos (--syllables)
+SYLLABLES_DIR = "syllables"
+
+# Índice de assets: identificadores de tarjetas/palabras -> clip, tamaño, duración y hash
+ASSET_INDEX_NAME = "audio_index.json"
+
+# Service worker de precarga offline (--service-worker); se escribe junto a index.html
+PRECACHE_MANIFEST_NAME = "precache-manifest.json"
+SERVICE_WORKER_NAME = "sw.js"
+# Orden de precarga: lo primero que se muestra en las tarjetas se descarga antes
+PRECACHE_PRIORITY = ("zhuyin_sounds", "consonants/words", "vowels/words", "tones/examples",
+                     "consonants/sentences", "vowels/sentences", "individual_words")
+PRECACHE_SHELL = ("index.html", "script.js", "style.css")
+SERVICE_WORKER_TEMPLATE = """// Generated by zhuyin_audio_generator.py --service-worker, do not edit by hand
+const VERSION = '__VERSION__';
+const CACHE_NAME = 'zhuyin-precache';
+const MANIFEST_URL = `__MANIFEST__?v=${VERSION}`;
+const CONCURRENCY = 6;
+
+let lookupPromise = null;
+
+function cacheKey(entry) {
+    // Versioned URLs (?v=hash) are their own key; the rest get the revision appended
+    return entry.url.includes('?') ? entry.url : `${entry.url}?__rev=${entry.revision}`;
+}
+
+async function loadManifest() {
+    const cache = await caches.open(CACHE_NAME);
+    let response = await cache.match(MANIFEST_URL);
+    if (!response) {
+        response = await fetch(MANIFEST_URL, { cache: 'no-cache' });
+        if (!response.ok) {
+            throw new Error(`Precache manifest: HTTP ${response.status}`);
+        }
+        await cache.put(MANIFEST_URL, response.clone());
+    }
+    return response.json();
+}
+
+function getLookup() {
+    // Absolute request URL (with and without query) -> absolute cache key
+    if (!lookupPromise) {
+        lookupPromise = loadManifest().then(manifest => {
+            const lookup = new Map();
+            for (const group of manifest.groups) {
+                for (const entry of group.entries) {
+                    const url = new URL(entry.url, self.registration.scope);
+                    const key = new URL(cacheKey(entry), self.registration.scope).href;
+                    lookup.set(url.href, key);
+                    lookup.set(url.origin + url.pathname, key);
+                }
+            }
+            return lookup;
+        }).catch(error => {
+            // Retry on a later request instead of keeping the failure forever
+            lookupPromise = null;
+            throw error;
+        });
+    }
+    return lookupPromise;
+}
+
+self.addEventListener('install', event => {
+    event.waitUntil((async () => {
+        const manifest = await loadManifest();
+        const cache = await caches.open(CACHE_NAME);
+        const cached = new Set((await cache.keys()).map(request => request.url));
+        // Groups in priority order; only entries whose hash changed are downloaded
+        for (const group of manifest.groups) {
+            const missing = group.entries
+                .map(cacheKey)
+                .filter(key => !cached.has(new URL(key, self.registration.scope).href));
+            for (let i = 0; i < missing.length; i += CONCURRENCY) {
+                await Promise.all(missing.slice(i, i + CONCURRENCY).map(async key => {
+                    const response = await fetch(key, { cache: 'no-cache' });
+                    if (response.ok) {
+                        await cache.put(key, response);
+                    }
+                }));
+            }
+        }
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        // Drop entries (and manifests) from previous versions
+        const lookup = await getLookup();
+        const current = new Set(lookup.values());
+        current.add(new URL(MANIFEST_URL, self.registration.scope).href);
+        const cache = await caches.open(CACHE_NAME);
+        for (const request of await cache.keys()) {
+            if (!current.has(request.url)) {
+                await cache.delete(request);
+            }
+        }
+        await self.clients.claim();
+    })());
+});
+
+self.addEventListener('fetch', event => {
+    if (event.request.method !== 'GET') {
+        return;
+    }
+    event.respondWith((async () => {
+        let lookup;
+        try {
+            lookup = await getLookup();
+        } catch (error) {
+            // Manifest unavailable (e.g. evicted while offline): behave like a plain network fetch
+            return fetch(event.request);
+        }
+        const url = new URL(event.request.url);
+        const key = lookup.get(url.href)
+            || lookup.get(url.origin + url.pathname)
+            || (url.pathname.endsWith('/') ? lookup.get(url.origin + url.pathname + 'index.html') : undefined);
+        if (key) {
+            const cached = await caches.match(key);
+            if (cached) {
+                return cached;
+            }
+        }
+        return fetch(event.request);
+    })());
+});
+"""
+
+# Estado del postprocesado (recorte de silencios y normalización)
+POSTPROCESS_STATE_NAME = "postprocess_state.json"
+DEFAULT_POSTPROCESS_SETTINGS = {"codec": "mp3", "bitrate": "48k", "loudness": -16.0, "silence_db": -50.0}
+
+# Archivo empaquetado (--pack): cabecera + índice JSON + clips contiguos, legible con mmap
+ARCHIVE_SUFFIX = ".pack"
+ARCHIVE_MAGIC = b"ZHPK"
+ARCHIVE_VERSION = 1
+ARCHIVE_HEADER = struct.Struct("<4sHHII")  # magia, versión, reservado, tamaño del índice, inicio de los datos
+ARCHIVE_ALIGNMENT = 4096
+ARCHIVE_EXCLUDE = (LOCKFILE_NAME, JOURNAL_NAME, POSTPROCESS_STATE_NAME)
+
+
+def remove_if_exists(filename: str):
+    """Elimina filename si existe (sin escribir nunca sobre un hard link compartido)"""
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+
+
+def fsync_path(path: str):
+    """fsync de un archivo o directorio por su ruta (ignora los que no se pueden abrir)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # Borrado entretanto, o directorios en Windows
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def link_or_copy(source: str, target: str, sync: bool = False):
+    """
+    Crea target como hard link de source (o copia), reemplazándolo de forma atómica
+    
+    Con sync, los datos del temporal se llevan al disco antes del rename
+    (en un hard link ya sincronizado el fsync apenas cuesta).
+    """
+    tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    remove_if_exists(tmp)
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    if sync:
+        fsync_path(tmp)
+    os.replace(tmp, target)
+    remove_if_exists(tmp)  # rename() no hace nada si ambos ya son el mismo archivo
+
+
+# Trama MPEG-1 Layer III de silencio: 32 kbps, 44.1 kHz, mono (104 bytes, 1152 muestras)
+SILENT_MP3_HEADER = bytes([0xFF, 0xFB, 0x10, 0xC4])
+SILENT_MP3_FRAME_SIZE = 104
+SILENT_MP3_FRAME_SECONDS = 1152 / 44100
+
+
+def make_silent_mp3(duration: float, tag: bytes = b'') -> bytes:
+    """
+    Construye un MP3 válido de silencio con la duración indicada
+
+    La información lateral a cero hace que cada trama decodifique como
+    silencio; tag se guarda en los datos auxiliares de la primera trama
+    para que cada payload sea distinto y determinista.
+    """
+    frames = max(1, round(duration / SILENT_MP3_FRAME_SECONDS))
+    body = bytearray(SILENT_MP3_HEADER + bytes(SILENT_MP3_FRAME_SIZE - 4))
+    first = bytearray(body)
+    first[21:21 + len(tag[:SILENT_MP3_FRAME_SIZE - 21])] = tag[:SILENT_MP3_FRAME_SIZE - 21]
+    return bytes(first) + bytes(body) * (frames - 1)
+
+
+# Tablas de cabecera MPEG Layer III: bitrates (kbps) y frecuencias de muestreo (Hz)
+MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],  # MPEG-1
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],  # MPEG-2 y 2.5
+}
+MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+Mp3Info = namedtuple('Mp3Info', 'start end frames duration truncated')
+
+
+def mp3_info(data: bytes) -> Optional[Mp3Info]:
+    """
+    Recorre las tramas MPEG Layer III de un MP3 sin decodificarlo
+
+    Omite las etiquetas ID3v2 (inicio) e ID3v1 (final).
+    
+    Returns:
+        Mp3Info: Rango [start, end) con las tramas de audio, número de tramas,
+            duración en segundos y si la última trama está truncada; None si
+            no contiene ninguna trama válida
+    """
+    start, end = 0, len(data)
+    if data[:3] == b'ID3' and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    if end - start >= 128 and data[end - 128:end - 125] == b'TAG':
+        end -= 128
+    
+    pos, first, frames, duration, truncated = start, None, 0, 0.0, False
+    while pos + 4 <= end:
+        b1, b2 = data[pos + 1], data[pos + 2]
+        version = (b1 >> 3) & 0x03  # 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+        layer = (b1 >> 1) & 0x03  # 1 = Layer III
+        bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 0x03
+        if (data[pos] != 0xFF or b1 & 0xE0 != 0xE0 or version == 1 or layer != 1
+                or bitrate_index in (0, 15) or rate_index == 3):
+            if first is not None:
+                break  # Datos que no son audio tras las tramas
+            pos += 1  # Buscar la primera sincronización
+            continue
+        bitrate = MP3_BITRATES[1 if version == 3 else 2][bitrate_index] * 1000
+        sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+        samples = 1152 if version == 3 else 576
+        length = samples // 8 * bitrate // sample_rate + ((b2 >> 1) & 0x01)
+        if pos + length > end:
+            truncated = True
+            break
+        if first is None:
+            first = pos
+        frames += 1
+        duration += samples / sample_rate
+        pos += length
+    if first is None:
+        return None
+    return Mp3Info(first, pos, frames, duration, truncated)
+
+
+def mp3_silence_like(data: bytes, duration: float) -> bytes:
+    """
+    Tramas de silencio con el mismo formato (versión, frecuencia, bitrate) que data
+    
+    Copia la cabecera de la primera trama sin CRC ni relleno y deja la
+    información lateral a cero, que decodifica como silencio; así puede
+    intercalarse entre tramas de data sin mezclar formatos.
+    """
+    info = mp3_info(data)
+    if info is None or duration <= 0:
+        return b''
+    header = bytearray(data[info.start:info.start + 4])
+    header[1] |= 0x01  # Sin CRC
+    header[2] &= ~0x02 & 0xFF  # Sin relleno
+    version, b2 = (header[1] >> 3) & 0x03, header[2]
+    bitrate = MP3_BITRATES[1 if version == 3 else 2][b2 >> 4] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][(b2 >> 2) & 0x03]
+    samples = 1152 if version == 3 else 576
+    length = samples // 8 * bitrate // sample_rate
+    frames = max(1, round(duration * sample_rate / samples))
+    return (bytes(header) + bytes(length - 4)) * frames
+
+
+def concat_mp3(words: List[List[bytes]], gap: float = 0.0, crossfade: float = 0.0,
+               ffmpeg: Optional[str] = None) -> bytes:
+    """
+    Une clips MP3 en uno solo: sílabas de cada palabra seguidas y silencio entre palabras
+    
+    Sin ffmpeg (o sin fundido) se concatenan las tramas directamente, sin
+    recodificar; con ffmpeg y crossfade > 0 las sílabas de cada palabra se
+    funden con acrossfade antes de unir las palabras.
+    
+    Args:
+        words: Por cada palabra, los MP3 de sus sílabas en orden
+        gap: Silencio entre palabras (segundos)
+        crossfade: Duración del fundido entre sílabas (segundos)
+        ffmpeg: Ruta del ejecutable de ffmpeg (None = sin fundido)
+    """
+    def frames(data: bytes) -> bytes:
+        info = mp3_info(data)
+        return data[info.start:info.end] if info else b''
+        
+    pieces = []
+    for parts in words:
+        if ffmpeg and crossfade > 0 and len(parts) > 1:
+            pieces.append(frames(crossfade_mp3(parts, crossfade, ffmpeg)))
+        else:
+            pieces.append(b''.join(frames(part) for part in parts))
+    silence = mp3_silence_like(pieces[0], gap) if pieces and gap > 0 else b''
+    return silence.join(pieces)
+
+
+def crossfade_mp3(parts: List[bytes], seconds: float, ffmpeg: str) -> bytes:
+    """Funde clips MP3 consecutivos con el filtro acrossfade de ffmpeg"""
+    import tempfile
+    with tempfile.TemporaryDirectory(prefix="zhuyin_compose_") as tmp:
+        command = [ffmpeg, "-y", "-loglevel", "error"]
+        for i, data in enumerate(parts):
+            path = os.path.join(tmp, f"{i}.mp3")
+            with open(path, 'wb') as f:
+                f.write(data)
+            command += ["-i", path]
+        chain, previous = [], "[0:a]"
+        for i in range(1, len(parts)):
+            label = f"[a{i}]"
+            chain.append(f"{previous}[{i}:a]acrossfade=d={seconds}:c1=tri:c2=tri{label}")
+            previous = label
+        output = os.path.join(tmp, "out.mp3")
+        command += ["-filter_complex", ";".join(chain), "-map", previous, "-c:a", "libmp3lame", output]
+        subprocess.run(command, capture_output=True, check=True)
+        with open(output, 'rb') as f:
+            return f.read()
+
+
+def postprocess_clip(source: str, settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Recorta silencios, normaliza volumen y recodifica un clip con ffmpeg
+    
+    Función de nivel de módulo para poder ejecutarse en un ProcessPoolExecutor.
+    El resultado se escribe en un temporal y se renombra sobre el destino.
+    
+    Args:
+        source: Ruta del MP3 sintetizado
+        settings: codec, bitrate, loudness (LUFS) y silence_db
+    
+    Returns:
+        dict: source, output, bytes antes/después y error (si lo hubo)
+    """
+    codec = settings['codec']
+    output = source if codec == 'mp3' else str(Path(source).with_suffix('.opus'))
+    tmp = f"{output}.{os.getpid()}.tmp"
+    threshold = f"{settings['silence_db']}dB"
+    trim = f"silenceremove=start_periods=1:start_threshold={threshold}:start_silence=0.05"
+    filters = f"{trim},areverse,{trim},areverse,loudnorm=I={settings['loudness']}:TP=-1.5:LRA=11"
+    encoder = ["-c:a", "libmp3lame", "-f", "mp3"] if codec == 'mp3' else ["-c:a", "libopus", "-f", "ogg"]
+    command = [settings['ffmpeg'], "-y", "-loglevel", "error", "-i", source, "-af", filters,
+               *encoder, "-b:a", settings['bitrate'], tmp]
+    result = {"source": source, "output": output, "before": os.path.getsize(source)}
+    try:
+        subprocess.run(command, capture_output=True, check=True)
+        os.replace(tmp, output)
+        result["after"] = os.path.getsize(output)
+    except subprocess.CalledProcessError as e:
+        remove_if_exists(tmp)
+        result["error"] = e.stderr.decode('utf-8', 'replace').strip() or str(e)
+    return result
+
+
+class DeckFormatError(ValueError):
+    """El archivo del mazo no es JSON/JSONL válido"""
+
+
+# Campos obligatorios de cada tarjeta por categoría (rutas con puntos)
+CARD_SCHEMA = {
+    "consonants": ("zhuyin", "pinyin", "example_word.characters", "example_word.pinyin",
+                   "example_sentence.characters", "example_sentence.words"),
+    "vowels": ("zhuyin", "pinyin", "example_word.characters", "example_word.pinyin",
+               "example_sentence.characters", "example_sentence.words"),
+    "tones": ("tone_number", "example.characters", "example.pinyin"),
+}
+WORD_SCHEMA = ("characters", "pinyin")
+
+
+def validate_card(category: str, card: Any) -> List[str]:
+    """
+    Comprueba una tarjeta contra CARD_SCHEMA
+    
+    Args:
+        category: 'consonants', 'vowels' o 'tones'
+        card: Registro leído del mazo
+    
+    Returns:
+        list: Mensajes de error (vacía si la tarjeta es válida)
+    """
+    if not isinstance(card, dict):
+        return ["no es un objeto"]
+    errors = []
+    for field in CARD_SCHEMA[category]:
+        value = card
+        for key in field.split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is None or value == "":
+            errors.append(f"falta '{field}'")
+        elif field == "tone_number":
+            if not isinstance(value, int):
+                errors.append("'tone_number' debe ser un entero")
+        elif field == "example_sentence.words":
+            if not isinstance(value, list):
+                errors.append("'example_sentence.words' debe ser una lista")
+                continue
+            for i, word in enumerate(value):
+                for key in WORD_SCHEMA:
+                    if not isinstance(word, dict) or not isinstance(word.get(key), str) or not word[key]:
+                        errors.append(f"falta '{field}[{i}].{key}'")
+        elif not isinstance(value, str):
+            errors.append(f"'{field}' debe ser texto")
+    return errors
+
+
+class DeckSource:
+    """
+    Lector perezoso y validado de un mazo zhuyin
+    
+    Formatos admitidos:
+      - .json (como zhuyin_data.json): {"zhuyin_system": {"consonants": [...], ...}}.
+        Con ijson instalado se lee en streaming; sin él se carga una vez con json.
+      - .jsonl: una tarjeta por línea con su campo "category"; siempre en streaming.
+    Cada recorrido vuelve a abrir el archivo, de modo que en streaming la
+    memoria no crece con el tamaño del mazo. Se tolera el BOM de UTF-8.
+    """
+    
+    def __init__(self, path: Optional[str] = None, data: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self._data = data
+        self.streaming = data is None and (str(path).endswith('.jsonl') or ijson is not None)
+        
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> 'DeckSource':
+        """Mazo ya cargado en memoria (p. ej. los mazos escalados del benchmark)"""
+        return cls(data=data)
+        
+    def _load(self) -> Dict[str, Any]:
+        if self._data is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8-sig') as f:
+                    self._data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise DeckFormatError(str(e))
+        return self._data
+        
+    def iter_records(self, categories=None):
+        """
+        Recorre las tarjetas del mazo en orden de archivo, sin validarlas
+        
+        Args:
+            categories: Categorías a incluir (None = todas)
+        
+        Yields:
+            tuple: (categoría, ubicación legible, tarjeta)
+        """
+        if str(self.path).endswith('.jsonl') and self._data is None:
+            yield from self._iter_jsonl(categories)
+        elif self.streaming:
+            yield from self._iter_json_stream(categories)
+        else:
+            system = self._load().get('zhuyin_system')
+            if not isinstance(system, dict):
+                raise DeckFormatError("falta el objeto 'zhuyin_system'")
+            for category, cards in system.items():
+                if categories is None or category in categories:
+                    for i, card in enumerate(cards or []):
+                        yield category, f"{category}[{i}]", card
+                        
+    def _iter_jsonl(self, categories):
+        with open(self.path, 'r', encoding='utf-8-sig') as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    card = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise DeckFormatError(f"línea {number}: {e}")
+                category = card.get('category') if isinstance(card, dict) else None
+                if categories is None or category in categories:
+                    yield category, f"línea {number}", card
+                    
+    def _iter_json_stream(self, categories):
+        with open(self.path, 'rb') as f:
+            if f.read(3) != b'\xef\xbb\xbf':
+                f.seek(0)
+            builder, depth, position, found = None, 0, {}, False
+            try:
+                for prefix, event, value in ijson.parse(f):
+                    if builder is None:
+                        if prefix == 'zhuyin_system' and event == 'start_map':
+                            found = True
+                        parts = prefix.split('.')
+                        if (len(parts) != 3 or parts[0] != 'zhuyin_system' or parts[2] != 'item'
+                                or event in ('end_map', 'end_array', 'map_key')
+                                or (categories is not None and parts[1] not in categories)):
+                            continue
+                        category = parts[1]
+                        i = position.get(category, 0)
+                        position[category] = i + 1
+                        if event not in ('start_map', 'start_array'):
+                            # Tarjeta que no es un objeto: validate() la informa igual que sin streaming
+                            yield category, f"{category}[{i}]", value
+                            continue
+                        builder, depth = ijson.ObjectBuilder(), 0
+                    builder.event(event, value)
+                    if event in ('start_map', 'start_array'):
+                        depth += 1
+                    elif event in ('end_map', 'end_array'):
+                        depth -= 1
+                    if depth == 0:
+                        yield category, f"{category}[{i}]", builder.value
+                        builder = None
+            except ijson.JSONError as e:
+                raise DeckFormatError(" ".join(str(e).split()))
+            if not found:
+                raise DeckFormatError("falta el objeto 'zhuyin_system'")
+                
+    def cards(self, category: str):
+        """Tarjetas de una categoría, generadas perezosamente"""
+        for _, _, card in self.iter_records((category,)):
+            yield card
+            
+    def validate(self, max_errors: int = 200) -> tuple:
+        """
+        Valida todo el mazo en una sola pasada
+        
+        Args:
+            max_errors: Errores a listar; los siguientes solo se cuentan y se
+                resumen en una última línea
+        
+        Returns:
+            tuple: (tarjetas por categoría, lista de errores "ubicación: mensaje")
+        """
+        counts = {category: 0 for category in CARD_SCHEMA}
+        errors, omitted = [], 0
+        for category, location, card in self.iter_records():
+            if category not in CARD_SCHEMA:
+                messages = [f"{location}: categoría desconocida '{category}'"]
+            else:
+                counts[category] += 1
+                label = card.get('zhuyin') or card.get('mark') if isinstance(card, dict) else None
+                messages = [f"{location}{f' ({label})' if label else ''}: {message}"
+                            for message in validate_card(category, card)]
+            for message in messages:
+                if len(errors) < max_errors:
+                    errors.append(message)
+                else:
+                    omitted += 1
+        if omitted:
+            errors.append(f"... y {omitted} errores más (se muestran los primeros {max_errors})")
+        return counts, errors
+        
+    def to_data(self) -> Dict[str, Any]:
+        """Materializa el mazo completo en memoria (formato zhuyin_data.json)"""
+        system: Dict[str, List[Any]] = {category: [] for category in CARD_SCHEMA}
+        for category, _, card in self.iter_records(tuple(CARD_SCHEMA)):
+            system[category].append(card)
+        return {"zhuyin_system": system}
+
+
+# --- Motor de sílabas zhuyin/pinyin -------------------------------------------------
+
+# Iniciales: pinyin -> zhuyin
+SYLLABLE_INITIALS = OrderedDict([
+    ("b", "ㄅ"), ("p", "ㄆ"), ("m", "ㄇ"), ("f", "ㄈ"), ("d", "ㄉ"), ("t", "ㄊ"), ("n", "ㄋ"),
+    ("l", "ㄌ"), ("g", "ㄍ"), ("k", "ㄎ"), ("h", "ㄏ"), ("j", "ㄐ"), ("q", "ㄑ"), ("x", "ㄒ"),
+    ("zh", "ㄓ"), ("ch", "ㄔ"), ("sh", "ㄕ"), ("r", "ㄖ"), ("z", "ㄗ"), ("c", "ㄘ"), ("s", "ㄙ"),
+])
+
+# Finales (tras inicial): pinyin -> zhuyin; "-i" es la vocal vacía de zhi/chi/shi/ri/zi/ci/si
+SYLLABLE_FINALS = OrderedDict([
+    ("a", "ㄚ"), ("o", "ㄛ"), ("e", "ㄜ"), ("ai", "ㄞ"), ("ei", "ㄟ"), ("ao", "ㄠ"), ("ou", "ㄡ"),
+    ("an", "ㄢ"), ("en", "ㄣ"), ("ang", "ㄤ"), ("eng", "ㄥ"), ("er", "ㄦ"), ("-i", ""),
+    ("i", "ㄧ"), ("ia", "ㄧㄚ"), ("ie", "ㄧㄝ"), ("iao", "ㄧㄠ"), ("iu", "ㄧㄡ"), ("ian", "ㄧㄢ"),
+    ("in", "ㄧㄣ"), ("iang", "ㄧㄤ"), ("ing", "ㄧㄥ"),
+    ("u", "ㄨ"), ("ua", "ㄨㄚ"), ("uo", "ㄨㄛ"), ("uai", "ㄨㄞ"), ("ui", "ㄨㄟ"), ("uan", "ㄨㄢ"),
+    ("un", "ㄨㄣ"), ("uang", "ㄨㄤ"), ("ong", "ㄨㄥ"),
+    ("ü", "ㄩ"), ("üe", "ㄩㄝ"), ("üan", "ㄩㄢ"), ("ün", "ㄩㄣ"), ("iong", "ㄩㄥ"),
+])
+
+# Combinaciones válidas: final -> iniciales que la admiten ("0" = sílaba sin inicial)
+SYLLABLE_TABLE = {
+    "a": "0 b p m f d t n l g k h zh ch sh z c s",
+    "o": "0 b p m f",
+    "e": "0 m d t n l g k h zh ch sh r z c s",
+    "ai": "0 b p m d t n l g k h zh ch sh z c s",
+    "ei": "0 b p m f d n l g h sh z",
+    "ao": "0 b p m d t n l g k h zh ch sh r z c s",
+    "ou": "0 p m f d t n l g k h zh ch sh r z c s",
+    "an": "0 b p m f d t n l g k h zh ch sh r z c s",
+    "en": "0 b p m f n g k h zh ch sh r z c s",
+    "ang": "0 b p m f d t n l g k h zh ch sh r z c s",
+    "eng": "0 b p m f d t n l g k h zh ch sh r z c s",
+    "er": "0",
+    "-i": "zh ch sh r z c s",
+    "i": "0 b p m d t n l j q x",
+    "ia": "0 l j q x",
+    "ie": "0 b p m d t n l j q x",
+    "iao": "0 b p m d t n l j q x",
+    "iu": "0 m d n l j q x",
+    "ian": "0 b p m d t n l j q x",
+    "in": "0 b p m n l j q x",
+    "iang": "0 n l j q x",
+    "ing": "0 b p m d t n l j q x",
+    "u": "0 b p m f d t n l g k h zh ch sh r z c s",
+    "ua": "0 g k h zh ch sh",
+    "uo": "0 d t n l g k h zh ch sh r z c s",
+    "uai": "0 g k h zh ch sh",
+    "ui": "0 d t g k h zh ch sh r z c s",
+    "uan": "0 d t n l g k h zh ch sh r z c s",
+    "un": "0 d t l g k h zh ch sh r z c s",
+    "uang": "0 g k h zh ch sh",
+    "ong": "0 d t n l g k h zh ch r z c s",
+    "ü": "0 n l j q x",
+    "üe": "0 n l j q x",
+    "üan": "0 j q x",
+    "ün": "0 j q x",
+    "iong": "0 j q x",
+}
+
+# Ortografía pinyin de las sílabas sin inicial
+STANDALONE_PINYIN = {
+    "i": "yi", "ia": "ya", "ie": "ye", "iao": "yao", "iu": "you", "ian": "yan", "in": "yin",
+    "iang": "yang", "ing": "ying", "u": "wu", "ua": "wa", "uo": "wo", "uai": "wai", "ui": "wei",
+    "uan": "wan", "un": "wen", "uang": "wang", "ong": "weng", "ü": "yu", "üe": "yue",
+    "üan": "yuan", "ün": "yun", "iong": "yong",
+}
+
+# Tonos: 1-4 y 5 = neutro. Zhuyin marca el tono tras la sílaba (el 1 sin marca)
+ZHUYIN_TONE_MARKS = {1: "", 2: "ˊ", 3: "ˇ", 4: "ˋ", 5: "˙"}
+PINYIN_TONE_VOWELS = {"a": "āáǎà", "e": "ēéěè", "i": "īíǐì", "o": "ōóǒò", "u": "ūúǔù", "ü": "ǖǘǚǜ"}
+
+Syllable = namedtuple("Syllable", "initial final tone")
+
+
+def syllable_pinyin(syllable: Syllable, numeric: bool = False) -> str:
+    """
+    Pinyin de una sílaba: con diacríticos ('lǜ') o numérico en ASCII ('lv4')
+    """
+    initial, final, tone = syllable
+    if not initial:
+        base = STANDALONE_PINYIN.get(final, final)
+    elif final == "-i":
+        base = initial + "i"
+    elif initial in ("j", "q", "x") and final.startswith("ü"):
+        base = initial + "u" + final[1:]
+    else:
+        base = initial + final
+    if numeric:
+        return f"{base.replace('ü', 'v')}{tone}"
+    if tone == 5:
+        return base
+    # Regla del diacrítico: a/e primero, luego la o de "ou", si no la última vocal
+    for vowel in ("a", "e"):
+        if vowel in base:
+            index = base.index(vowel)
+            break
+    else:
+        index = base.index("o") if "ou" in base else max(base.rfind(v) for v in "iouü")
+    return base[:index] + PINYIN_TONE_VOWELS[base[index]][tone - 1] + base[index + 1:]
+
+
+def syllable_zhuyin(syllable: Syllable) -> str:
+    """Zhuyin de una sílaba con su marca de tono ('ㄌㄩˋ')"""
+    initial, final, tone = syllable
+    return SYLLABLE_INITIALS.get(initial, "") + SYLLABLE_FINALS[final] + ZHUYIN_TONE_MARKS[tone]
+
+
+def iter_syllables(tones=(1, 2, 3, 4)):
+    """Recorre todas las combinaciones inicial + final válidas en los tonos indicados"""
+    for final, initials in SYLLABLE_TABLE.items():
+        for initial in initials.split():
+            for tone in tones:
+                yield Syllable("" if initial == "0" else initial, final, tone)
+
+
+# Tablas inversas precalculadas: zhuyin sin tono / pinyin numérico -> sílaba
+ZHUYIN_INITIALS = {zhuyin: initial for initial, zhuyin in SYLLABLE_INITIALS.items()}
+ZHUYIN_SYLLABLES = {syllable_zhuyin(s): s[:2] for s in iter_syllables(tones=(1,))}
+PINYIN_SYLLABLES = {syllable_pinyin(s, numeric=True): s for s in iter_syllables(tones=(1, 2, 3, 4, 5))}
+ZHUYIN_TONES = {mark: tone for tone, mark in ZHUYIN_TONE_MARKS.items() if mark}
+ZHUYIN_TONES["ˉ"] = 1
+
+
+def parse_zhuyin(text: str) -> List[Syllable]:
+    """
+    Divide una cadena zhuyin_typing ('ㄅㄚˋㄅㄚ˙') en sílabas
+    
+    Usa la coincidencia más larga en ZHUYIN_SYLLABLES; el tono va tras la
+    sílaba (también se acepta ˙ delante, como en la escritura estándar).
+    
+    Raises:
+        ValueError: Si la cadena contiene una sílaba que no existe
+    """
+    syllables = []
+    position = 0
+    text = "".join(text.split())
+    while position < len(text):
+        neutral = text[position] == "˙"
+        if neutral:
+            position += 1
+        for length in (3, 2, 1):
+            parts = ZHUYIN_SYLLABLES.get(text[position:position + length])
+            if parts is not None:
+                position += length
+                break
+        else:
+            raise ValueError(f"Sílaba zhuyin no válida en '{text}' (posición {position})")
+        tone = 5 if neutral else 1
+        if position < len(text) and text[position] in ZHUYIN_TONES:
+            tone = ZHUYIN_TONES[text[position]]
+            position += 1
+        syllables.append(Syllable(parts[0], parts[1], tone))
+    return syllables
+
+
+def parse_pinyin(text: str) -> List[Syllable]:
+    """
+    Convierte pinyin numérico separado por espacios ('ni3 hao3', 'lv4') en sílabas
+    
+    Raises:
+        ValueError: Si alguna sílaba no existe
+    """
+    syllables = []
+    for token in text.lower().replace("ü", "v").split():
+        if token[-1] not in "12345":
+            token += "5"
+        if token not in PINYIN_SYLLABLES:
+            raise ValueError(f"Sílaba pinyin no válida: '{token}'")
+        syllables.append(PINYIN_SYLLABLES[token])
+    return syllables
+
+
+def apply_tone_sandhi(syllables: List[Syllable], characters: str = "") -> List[Syllable]:
+    """
+    Aplica el sandhi tonal del mandarín a una secuencia de sílabas
+    
+    - 一 (yī): 2.º tono ante un 4.º; 4.º ante 1.º, 2.º o 3.º
+    - 不 (bù): 2.º tono ante un 4.º
+    - 3-3: en una serie de terceros tonos todos menos el último pasan a 2.º
+    
+    Args:
+        syllables: Sílabas con su tono de diccionario
+        characters: Caracteres alineados sílaba a sílaba; identifican 一 y 不
+            (si no coinciden en longitud solo se aplica la regla 3-3)
+    """
+    result = list(syllables)
+    hanzi = characters if len(characters) == len(result) else ""
+    for i in range(len(result) - 1):
+        current, following = result[i], syllables[i + 1].tone
+        if hanzi and hanzi[i] == "一" and current.tone == 1 and following in (1, 2, 3, 4):
+            result[i] = current._replace(tone=2 if following == 4 else 4)
+        elif hanzi and hanzi[i] == "不" and current.tone == 4 and following == 4:
+            result[i] = current._replace(tone=2)
+    for i in range(len(result) - 1):
+        if result[i].tone == 3 and result[i + 1].tone == 3:
+            result[i] = result[i]._replace(tone=2)
+    return result
+
+
+class TTSBackend:
+    """
+    Interfaz de los motores de síntesis usados por ZhuyinAudioGenerator
+
+    Cada backend devuelve el audio como bytes; el generador se encarga de
+    la caché, el límite de velocidad y la escritura en disco.
+    """
+
+    name = "base"
+    requires_network = False
+    estimated_latency = ESTIMATED_SYNTHESIS_LATENCY
+    requirements = ""  # Qué instalar cuando is_available() es False
+
+    def synthesize(self, text: str, lang: str, slow: bool = False) -> bytes:
+        """Sintetiza text y devuelve el audio (MP3) como bytes"""
+        raise NotImplementedError
+
+    def voice_params(self) -> Dict[str, Any]:
+        """Parámetros que identifican la voz (forman parte de la clave de caché)"""
+        return {"backend": self.name}
+
+    def is_available(self) -> bool:
+        """Indica si el backend puede usarse en esta máquina"""
+        return True
+
+    def check_connection(self) -> Optional[bool]:
+        """Sonda de conectividad propia del backend (None = usar la comprobación genérica)"""
+        return None
+
+    def close(self):
+        """Libera conexiones u otros recursos del backend"""
+
+
+class GTTSBackend(TTSBackend):
+    """Google Text-to-Speech (requiere conexión a internet)"""
+
+    name = "gtts"
+    requires_network = True
+    requirements = "el paquete gtts"
+
+    def __init__(self, tld: str = "com"):
+        """
+        Args:
+            tld: Dominio de Google Translate que determina la voz
+        """
+        self.tld = tld
+
+    def is_available(self) -> bool:
+        return importlib.util.find_spec("gtts") is not None
+
+    def synthesize(self, text: str, lang: str, slow: bool = False) -> bytes:
+        from gtts import gTTS
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang, slow=slow, tld=self.tld).write_to_fp(buffer)
+        return buffer.getvalue()
+
+    def voice_params(self) -> Dict[str, Any]:
+        # Sin nombre de backend: mantiene las claves de caché y el lockfile previos
+        return {"tld": self.tld}
+
+
+class GTTSAsyncBackend(GTTSBackend):
+    """
+    gTTS sobre un transporte asyncio con sesión HTTP persistente (requiere aiohttp)
+
+    Construye las peticiones con gTTS._prepare_requests, pero las envía por
+    una única sesión aiohttp keep-alive que vive en su propio bucle de
+    eventos: los hilos del pool comparten las conexiones TLS abiertas en vez
+    de abrir una nueva por clip, y muchos textos cortos viajan a la vez. La
+    respuesta se decodifica línea a línea según llega.
+    """
+
+    name = "gtts-async"
+    requirements = "los paquetes gtts y aiohttp"
+    estimated_latency = ESTIMATED_SYNTHESIS_LATENCY / 2
+
+    def __init__(self, tld: str = "com", endpoint: Optional[str] = None, connections: int = 8, timeout: float = 15.0):
+        """
+        Args:
+            tld: Dominio de Google Translate que determina la voz
+            endpoint: URL alternativa del servicio (p. ej. un servidor de pruebas local)
+            connections: Conexiones keep-alive máximas del pool
+            timeout: Tiempo máximo por petición (segundos)
+        """
+        super().__init__(tld)
+        self.endpoint = endpoint
+        self.connections = connections
+        self.timeout = timeout
+        self._loop = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        return super().is_available() and importlib.util.find_spec("aiohttp") is not None
+
+    def voice_params(self) -> Dict[str, Any]:
+        # Mismo audio que gtts: comparte sus entradas de caché salvo con otro endpoint
+        params = super().voice_params()
+        if self.endpoint:
+            params["endpoint"] = self.endpoint
+        return params
+
+    def _run(self, coroutine):
+        """Ejecuta una corrutina en el bucle del transporte y espera su resultado"""
+        import asyncio
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="tts-transport", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _get_session(self):
+        # Solo se llama desde el hilo del bucle: no necesita cerrojo
+        if self._session is None:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connections, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def _fetch(self, text: str, lang: str, slow: bool) -> bytes:
+        from gtts import gTTS
+        session = await self._get_session()
+        audio = bytearray()
+        for request in gTTS(text=text, lang=lang, slow=slow, tld=self.tld)._prepare_requests():
+            headers = {k: v for k, v in request.headers.items() if k.lower() != "content-length"}
+            async with session.post(self.endpoint or request.url, data=request.body, headers=headers) as response:
+                if response.status >= 400:
+                    raise RuntimeError(f"{self.endpoint or request.url} respondió HTTP {response.status}")
+                found = False
+                async for line in response.content:
+                    decoded = line.decode("utf-8", "replace")
+                    if "jQ1olc" not in decoded:
+                        continue
+                    match = re.search(r'jQ1olc","\[\\"(.*)\\"]', decoded)
+                    if match is None:
+                        raise RuntimeError("La respuesta no contiene audio")
+                    audio += base64.b64decode(match.group(1))
+                    found = True
+                if not found:
+                    raise RuntimeError("La respuesta no contiene audio")
+        return bytes(audio)
+
+    def synthesize(self, text: str, lang: str, slow: bool = False) -> bytes:
+        return self._run(self._fetch(text, lang, slow))
+
+    def check_connection(self) -> Optional[bool]:
+        import asyncio
+        import aiohttp
+        from gtts.utils import _translate_url
+        
+        async def probe():
+            session = await self._get_session()
+            # Cualquier respuesta HTTP vale: deja la primera conexión abierta en el pool
+            async with session.get(self.endpoint or _translate_url(tld=self.tld)) as response:
+                await response.read()
+                return True
+        try:
+            return self._run(probe())
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+            return False
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._session is not None:
+            self._run(self._session.close())
+            self._session = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+
+class EspeakBackend(TTSBackend):
+    """
+    Motor local espeak-ng (sin conexión)
+
+    espeak-ng produce WAV, que se convierte a MP3 con ffmpeg; sin ffmpeg el
+    backend no está disponible (los clips, la caché, --verify y los sprites
+    esperan MP3).
+    """
+
+    name = "espeak"
+    estimated_latency = 0.1
+    requirements = "espeak-ng y ffmpeg (para convertir a MP3)"
+    voices = {"zh": "cmn", "zh-TW": "cmn", "zh-CN": "cmn"}
+
+    def __init__(self):
+        self.binary = shutil.which("espeak-ng") or shutil.which("espeak")
+        self.ffmpeg = shutil.which("ffmpeg")
+
+    def is_available(self) -> bool:
+        return self.binary is not None and self.ffmpeg is not None
+
+    def voice_params(self) -> Dict[str, Any]:
+        return {"backend": self.name, "mp3": self.ffmpeg is not None}
+
+    def synthesize(self, text: str, lang: str, slow: bool = False) -> bytes:
+        voice = self.voices.get(lang, lang)
+        speed = "110" if slow else "160"
+        wav = subprocess.run([self.binary, "-v", voice, "-s", speed, "--stdout", text],
+                             capture_output=True, check=True).stdout
+        return subprocess.run([self.ffmpeg, "-loglevel", "error", "-i", "pipe:0", "-f", "mp3", "-b:a", "64k", "pipe:1"],
+                              input=wav, capture_output=True, check=True).stdout
+
+
+class FakeBackend(TTSBackend):
+    """
+    Backend sintético determinista para benchmarks y CI sin red
+
+    Devuelve MP3 de silencio cuya duración depende del texto y cuyo
+    contenido incluye el hash del texto, con latencia y tasa de fallos
+    configurables.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        """
+        Args:
+            latency: Segundos de espera simulada por síntesis
+            failure_rate: Probabilidad (0-1) de que una síntesis falle
+            seed: Semilla del generador de fallos
+        """
+        self.latency = latency
+        self.estimated_latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def synthesize(self, text: str, lang: str, slow: bool = False) -> bytes:
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            failed = self.random.random() < self.failure_rate
+        if failed:
+            raise RuntimeError("fallo sintético del backend fake")
+        tag = hashlib.sha256(f"{lang}:{slow}:{text}".encode('utf-8')).digest()
+        return make_silent_mp3(0.3 + 0.2 * len(text), tag)
+
+
+TTS_BACKENDS = {
+    "gtts": GTTSBackend,
+    "gtts-async": GTTSAsyncBackend,
+    "espeak": EspeakBackend,
+    "fake": FakeBackend,
+}
+
+
+class AtomicWriter:
+    """
+    Escritura de clips en un archivo temporal + os.replace, con fsync
+
+    Los datos del temporal se sincronizan antes del rename, así que ni una
+    interrupción ni un corte de luz dejan un clip vacío o a medias en su
+    ruta final: como mucho quedan temporales *.tmp, que OutputSnapshot
+    elimina. Lo que se agrupa es el fsync de los directorios (que hace
+    duraderos los renames): uno por directorio cada `batch` escrituras y
+    en flush. Un clip renombrado pero aún sin fsync de su directorio puede
+    perderse tras un corte, pero nunca quedar truncado. Con batch = 0 no
+    se hace ningún fsync y solo se garantiza frente a interrupciones del
+    proceso.
+    """
+
+    def __init__(self, batch: int = 64):
+        """
+        Args:
+            batch: Escrituras por fsync en bloque de directorios (0 = no sincronizar)
+        """
+        self.batch = batch
+        self.synced = 0
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+
+    def write(self, path: str, data: bytes):
+        """Escribe data en path de forma atómica"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            if self.batch:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+        self._track(path)
+
+    def link(self, source: str, target: str):
+        """Enlaza (o copia) source en target de forma atómica"""
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        link_or_copy(source, target, sync=bool(self.batch))
+        self._track(target)
+
+    def _track(self, path: str):
+        if not self.batch:
+            return
+        with self._lock:
+            self._pending.append(path)
+            if len(self._pending) < self.batch:
+                return
+            pending, self._pending = self._pending, []
+        self._sync(pending)
+
+    def flush(self):
+        """Sincroniza con el disco todo lo escrito desde el último lote"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        self._sync(pending)
+
+    def _sync(self, paths: List[str]):
+        # Los datos ya se sincronizaron antes de cada rename; aquí solo los directorios
+        for directory in sorted({os.path.dirname(p) or "." for p in paths}):
+            fsync_path(directory)
+        with self._lock:
+            self.synced += len(paths)
+
+
+class OutputSnapshot:
+    """
+    Foto del árbol de salida tomada con una sola pasada recursiva de os.scandir
+
+    Sustituye a un os.path.exists por clip al planificar y elimina los
+    temporales huérfanos que dejó una ejecución interrumpida.
+    """
+
+    def __init__(self, root):
+        self.paths = set()
+        self.removed_temps = 0
+        self._scan(str(root))
+
+    def _scan(self, directory: str):
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            return
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    self._scan(entry.path)
+                elif entry.name.endswith(".tmp"):
+                    remove_if_exists(entry.path)
+                    self.removed_temps += 1
+                else:
+                    self.paths.add(entry.path)
+
+    def exists(self, path: str) -> bool:
+        return str(path) in self.paths
+
+
+def verify_clip(path: str) -> Optional[str]:
+    """
+    Comprueba que un clip es un MP3 completo y decodificable
+    
+    Función de nivel de módulo para poder ejecutarse en un ProcessPoolExecutor.
+    
+    Returns:
+        str: Descripción del problema, o None si el clip es válido
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        return str(e)
+    if not data:
+        return "archivo vacío"
+    info = mp3_info(data)
+    if info is None:
+        return "no es un MP3 decodificable"
+    if info.truncated:
+        return "MP3 truncado"
+    return None
+
+
+class ArchiveFormatError(ValueError):
+    """Archivo de audios empaquetado con cabecera o índice inválidos"""
+
+
+ArchiveEntry = namedtuple("ArchiveEntry", "offset size hash")
+
+
+def write_audio_archive(root, target, exclude=ARCHIVE_EXCLUDE) -> Dict[str, int]:
+    """
+    Empaqueta el árbol de audios en un único archivo indexado
+    
+    Formato (little-endian): cabecera ARCHIVE_HEADER (magia, versión,
+    reservado, tamaño del índice, inicio de los datos), índice JSON
+    {clave: [desplazamiento, tamaño, hash]} y los contenidos contiguos a
+    partir de un límite de página. Las claves son rutas relativas a root;
+    los clips con el mismo contenido (p. ej. enlaces duros) comparten datos.
+    El archivo se escribe en un temporal y se renombra al terminar.
+    
+    Args:
+        root: Directorio de audios a empaquetar
+        target: Ruta del archivo de salida
+        exclude: Nombres de archivo de control que no se empaquetan
+    
+    Returns:
+        dict: Número de claves, contenidos únicos y bytes del archivo
+    """
+    root = Path(root)
+    snapshot = OutputSnapshot(root)
+    keys = sorted(Path(path).relative_to(root).as_posix() for path in snapshot.paths
+                  if os.path.basename(path) not in exclude)
+    
+    entries, payloads, offsets, offset = {}, [], {}, 0
+    for key in keys:
+        with open(root / key, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        if digest not in offsets:
+            offsets[digest] = offset
+            payloads.append(root / key)
+            offset += len(data)
+        entries[key] = [offsets[digest], len(data), digest]
+        
+    index = json.dumps({"root": root.name, "entries": entries}, ensure_ascii=False,
+                       separators=(',', ':')).encode('utf-8')
+    data_offset = -(-(ARCHIVE_HEADER.size + len(index)) // ARCHIVE_ALIGNMENT) * ARCHIVE_ALIGNMENT
+    
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    with open(tmp, 'wb') as out:
+        out.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, 0, len(index), data_offset))
+        out.write(index)
+        out.write(bytes(data_offset - ARCHIVE_HEADER.size - len(index)))
+        for path in payloads:
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, out)
+    os.replace(tmp, target)
+    return {"keys": len(entries), "unique": len(payloads), "bytes": data_offset + offset}
+
+
+class AudioArchive:
+    """
+    Lector de un archivo creado con write_audio_archive
+
+    El archivo se proyecta en memoria con mmap y get() devuelve un
+    memoryview sobre los bytes del clip, sin copiarlos. Las vistas deben
+    liberarse (o dejar de usarse) antes de close().
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ArchiveFormatError(f"{self.path}: archivo vacío")
+        try:
+            self._read_index()
+        except ArchiveFormatError:
+            self.close()
+            raise
+            
+    def _read_index(self):
+        if len(self._map) < ARCHIVE_HEADER.size:
+            raise ArchiveFormatError(f"{self.path}: cabecera truncada")
+        magic, version, _, index_size, data_offset = ARCHIVE_HEADER.unpack_from(self._map)
+        if magic != ARCHIVE_MAGIC:
+            raise ArchiveFormatError(f"{self.path}: no es un archivo de audios empaquetado")
+        if version != ARCHIVE_VERSION:
+            raise ArchiveFormatError(f"{self.path}: versión {version} no soportada")
+        try:
+            index = json.loads(self._map[ARCHIVE_HEADER.size:ARCHIVE_HEADER.size + index_size].decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ArchiveFormatError(f"{self.path}: índice ilegible ({e})")
+        self.root = index.get('root', '')
+        self.data_offset = data_offset
+        self.entries = {key: ArchiveEntry(*value) for key, value in index['entries'].items()}
+        for key in self.entries:
+            # Las claves son rutas relativas sin '..': extract() no puede salir del destino
+            parts = key.replace('\\', '/').split('/')
+            if not key or key.startswith('/') or os.path.isabs(key) or ':' in parts[0] or '..' in parts or '' in parts:
+                raise ArchiveFormatError(f"{self.path}: clave no permitida {key!r}")
+        end = max((entry.offset + entry.size for entry in self.entries.values()), default=0)
+        if data_offset + end > len(self._map):
+            raise ArchiveFormatError(f"{self.path}: datos truncados")
+            
+    def __enter__(self) -> 'AudioArchive':
+        return self
+        
+    def __exit__(self, *exc):
+        self.close()
+        
+    def __len__(self) -> int:
+        return len(self.entries)
+        
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+        
+    def keys(self) -> List[str]:
+        return list(self.entries)
+        
+    def get(self, key: str) -> Optional[memoryview]:
+        """Bytes del clip (sin copia) o None si la clave no existe"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        start = self.data_offset + entry.offset
+        return memoryview(self._map)[start:start + entry.size]
+        
+    def extract(self, directory) -> int:
+        """
+        Restaura el árbol de audios en directory
+        
+        Los clips que comparten contenido se recrean como enlaces duros
+        (o copias), igual que los escribe la generación.
+        
+        Returns:
+            int: Número de archivos escritos
+        """
+        writer, first = AtomicWriter(), {}
+        root = Path(directory).resolve()
+        for key, entry in self.entries.items():
+            target = root / key
+            if root not in target.resolve().parents:
+                raise ArchiveFormatError(f"{self.path}: la clave {key!r} sale de {root}")
+            target = str(target)
+            source = first.setdefault(entry.offset, target)
+            if source != target:
+                writer.link(source, target)
+            else:
+                view = self.get(key)
+                writer.write(target, view)
+                view.release()
+        writer.flush()
+        return len(self.entries)
+        
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def serve_audio_archive(path, host: str = "127.0.0.1", port: int = 8000):
+    """
+    Servidor HTTP estático mínimo que sirve los clips de un archivo por clave
+    
+    GET/HEAD /<clave> (o /<raíz>/<clave>, p. ej. /zhuyin_audios/tones/...)
+    devuelve el clip con ETag y caché inmutable, y admite peticiones Range
+    de un solo tramo para los elementos <audio>. GET / lista el índice.
+    Pensado para pruebas y despliegues sencillos; se detiene con Ctrl+C.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import unquote, urlsplit
+    import mimetypes
+    
+    archive = AudioArchive(path)
+    listing = json.dumps({key: {"size": entry.size, "hash": entry.hash} for key, entry in archive.entries.items()},
+                         ensure_ascii=False).encode('utf-8')
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_HEAD(self):
+            self.do_GET(body=False)
+            
+        def do_GET(self, body: bool = True):
+            key = unquote(urlsplit(self.path).path).lstrip('/')
+            if archive.root and key.startswith(archive.root + '/'):
+                key = key[len(archive.root) + 1:]
+            if not key:
+                self._send(200, listing, "application/json; charset=utf-8", body)
+                return
+            entry = archive.entries.get(key)
+            if entry is None:
+                self._send(404, b"Not found", "text/plain", body)
+                return
+            etag = f'"{entry.hash}"'
+            if self.headers.get('If-None-Match') == etag:
+                self._send(304, b"", None, False, etag)
+                return
+                
+            start, end, status = 0, entry.size - 1, 200
+            match = re.fullmatch(r"bytes=(\d*)-(\d*)", self.headers.get('Range', '').strip())
+            if match and any(match.groups()):
+                first, last = match.groups()
+                start = int(first) if first else max(0, entry.size - int(last))
+                end = min(int(last), entry.size - 1) if first and last else entry.size - 1
+                if start > end:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{entry.size}")
+                    self.end_headers()
+                    return
+                status = 206
+            view = archive.get(key)
+            try:
+                self._send(status, view[start:end + 1], mimetypes.guess_type(key)[0] or "application/octet-stream",
+                           body, etag, f"bytes {start}-{end}/{entry.size}" if status == 206 else None)
+            finally:
+                view.release()
+                
+        def _send(self, status, payload, content_type, body, etag=None, content_range=None):
+            self.send_response(status)
+            if content_type:
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+            if etag:
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+                self.send_header("Accept-Ranges", "bytes")
+            if content_range:
+                self.send_header("Content-Range", content_range)
+            self.end_headers()
+            if body:
+                self.wfile.write(payload)
+                
+        def log_message(self, format, *args):
+            pass
+            
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"🌐 Sirviendo {len(archive)} clips de {archive.path} en http://{host}:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Servidor detenido")
+    finally:
+        server.server_close()
+        archive.close()
+
+
+class SynthesisCache:
+    """
+    Caché persistente de audios direccionada por contenido
+
+    La clave es un hash del texto y de los parámetros TTS (idioma, voz, slow),
+    así que sobrevive a cambios de nombre de archivo, reorganizaciones del
+    mazo y --clean. Cuando supera max_bytes elimina las entradas usadas
+    hace más tiempo (LRU por fecha de modificación, que se renueva en cada acierto).
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        """
+        Args:
+            directory: Directorio donde se guardan las entradas
+            max_bytes: Tamaño máximo antes de desalojar entradas (0 = sin límite)
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self._total_bytes = None
+        self._pruning = False
+
+    @staticmethod
+    def make_key(text: str, **params) -> str:
+        """Calcula la clave de caché para un texto y sus parámetros TTS"""
+        payload = json.dumps({"text": text, **params}, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        """Ruta de la entrada (repartida en subdirectorios por prefijo)"""
+        return self.directory / key[:2] / f"{key}.mp3"
+
+    def get(self, key: str) -> Optional[Path]:
+        """Devuelve la ruta de la entrada si existe y la marca como usada"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return path
+
+    def put(self, key: str, source: str):
+        """Copia un audio recién sintetizado a la caché"""
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, path)
+        
+        with self.lock:
+            if self._total_bytes is not None:
+                self._total_bytes += path.stat().st_size
+            # Un solo hilo poda; los demás siguen escribiendo mientras tanto
+            over_limit = self.max_bytes and self.total_bytes() > self.max_bytes and not self._pruning
+            if over_limit:
+                self._pruning = True
+        if over_limit:
+            try:
+                self.prune(int(self.max_bytes * CACHE_PRUNE_LOW_WATER))
+            finally:
+                self._pruning = False
+
+    def entries(self) -> List[tuple]:
+        """Lista (ruta, stat) de todas las entradas"""
+        result = []
+        if not self.directory.exists():
+            return result
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.mp3'):
+                    result.append((entry.path, entry.stat()))
+        return result
+
+    def total_bytes(self) -> int:
+        """Tamaño total de la caché en bytes"""
+        if self._total_bytes is None:
+            self._total_bytes = sum(st.st_size for _, st in self.entries())
+        return self._total_bytes
+
+    def prune(self, max_bytes: Optional[int] = None) -> tuple:
+        """
+        Elimina las entradas menos usadas hasta quedar por debajo del límite
+        
+        Args:
+            max_bytes: Tamaño objetivo (por defecto max_bytes de la caché; put()
+                poda hasta CACHE_PRUNE_LOW_WATER para dejar margen)
+        
+        Returns:
+            tuple: (entradas eliminadas, bytes liberados)
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        with self.lock:
+            entries = sorted(self.entries(), key=lambda e: e[1].st_mtime)
+            total = sum(st.st_size for _, st in entries)
+            removed = freed = 0
+            for path, st in entries:
+                if total <= limit:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= st.st_size
+                removed += 1
+                freed += st.st_size
+            self._total_bytes = total
+        return removed, freed
+
+    def stats(self) -> Dict[str, Any]:
+        """Resumen de la caché (entradas, tamaño, aciertos/fallos de esta ejecución)"""
+        entries = self.entries()
+        return {
+            "directory": str(self.directory),
+            "entries": len(entries),
+            "bytes": sum(st.st_size for _, st in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class AudioLockfile:
+    """
+    Registro de qué texto y parámetros TTS produjeron cada clip de salida
+
+    Las rutas se guardan relativas a output_dir. Permite detectar clips
+    obsoletos aunque el nombre de archivo no cambie (p. ej. frases que solo
+    difieren después de los 10 primeros caracteres) y clips huérfanos.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, str]] = {}
+        self.exists = False
+
+    def load(self) -> 'AudioLockfile':
+        """Carga el lockfile si existe"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('clips', {})
+            self.exists = True
+        except FileNotFoundError:
+            self.entries = {}
+        except json.JSONDecodeError:
+            print(f"⚠️  Lockfile {self.path} corrupto, se ignorará")
+            self.entries = {}
+        return self
+
+    def save(self):
+        """Escribe el lockfile de forma atómica"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "clips": dict(sorted(self.entries.items()))}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+        self.exists = True
+
+
+class JobJournal:
+    """
+    Diario de trabajos de una generación (JSON lines, solo se añade)
+
+    Registra qué destinos existían al planificar y cada clip completado o
+    fallido, de modo que --resume continúa una ejecución interrumpida sin
+    volver a comprobar cada archivo en disco.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self._file = None
+
+    def read(self) -> Optional[Dict[str, bool]]:
+        """
+        Reconstruye el estado de la última ejecución
+        
+        Returns:
+            dict: ruta relativa -> True si está completa, o None si no hay diario
+        """
+        if not self.path.exists():
+            return None
+        state: Dict[str, bool] = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Última línea truncada por la interrupción
+                kind = event.get('event')
+                if kind == 'plan':
+                    state.update((target, True) for target in event.get('existing', []))
+                elif kind == 'done':
+                    state.update((target, True) for target in event.get('targets', []))
+                elif kind == 'failed':
+                    targets = event.get('targets', [event.get('target')])
+                    state.update((target, False) for target in targets if target)
+        return state
+
+    def open(self, resume: bool = False):
+        """Abre el diario (vaciándolo salvo al reanudar)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def append(self, event: str, **fields):
+        """Añade un evento y lo vuelca a disco inmediatamente"""
+        if self._file is None:
+            return
+        line = json.dumps({"event": event, "time": round(time.time(), 3), **fields}, ensure_ascii=False)
+        with self.lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+
+class CircuitBreaker:
+    """
+    Interruptor que pausa todo el pool cuando se disparan los errores
+
+    Si en la ventana de las últimas `window` síntesis la proporción de
+    fallos alcanza `threshold`, el circuito se abre y todos los workers
+    esperan `cooldown` segundos antes de volver a llamar al proveedor.
+    """
+
+    def __init__(self, threshold: float = 0.5, window: int = 20, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.outcomes = deque(maxlen=window)
+        self.open_until = 0.0
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """Bloquea mientras el circuito esté abierto"""
+        while True:
+            with self.lock:
+                remaining = self.open_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def record(self, success: bool) -> int:
+        """
+        Registra el resultado de una síntesis y abre el circuito si procede
+        
+        Returns:
+            int: Fallos recientes que abrieron el circuito (0 si sigue cerrado)
+        """
+        with self.lock:
+            self.outcomes.append(success)
+            if len(self.outcomes) < self.window // 2:
+                return 0
+            failures = self.outcomes.count(False)
+            if failures / len(self.outcomes) >= self.threshold and time.monotonic() >= self.open_until:
+                self.open_until = time.monotonic() + self.cooldown
+                self.outcomes.clear()
+                self.trips += 1
+                return failures
+            return 0
+
+
+class Histogram:
+    """Histograma acumulativo estilo Prometheus (buckets con límite superior)"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "buckets": {str(upper): count for upper, count in zip(self.buckets, self.counts)},
+        }
+
+
+class ProgressBar:
+    """Barra de progreso con ETA en una sola línea de stderr"""
+
+    def __init__(self, total: int, width: int = 30, stream=None):
+        self.total = total
+        self.width = width
+        self.stream = stream or sys.stderr
+        self.done = 0
+        self.started = time.monotonic()
+        self._drawn = 0.0
+
+    def advance(self, clips: int = 1, force: bool = False):
+        self.done += clips
+        now = time.monotonic()
+        # Redibujar como mucho 10 veces por segundo
+        if not force and now - self._drawn < 0.1 and self.done < self.total:
+            return
+        self._drawn = now
+        fraction = self.done / self.total if self.total else 1.0
+        elapsed = now - self.started
+        eta = elapsed / self.done * (self.total - self.done) if self.done else 0.0
+        filled = int(self.width * min(1.0, fraction))
+        bar = "█" * filled + "░" * (self.width - filled)
+        self.stream.write(f"\r  {bar} {fraction:4.0%} {self.done}/{self.total} "
+                          f"ETA {int(eta // 60):02d}:{int(eta % 60):02d}")
+        self.stream.flush()
+
+    def close(self):
+        self.advance(0, force=True)
+        self.stream.write("\n")
+        self.stream.flush()
+
+
+class GenerationMetrics:
+    """
+    Capa de eventos y métricas de la generación
+
+    Cada paso del pipeline emite un evento estructurado que actualiza
+    contadores, histogramas y la profundidad de la cola, se escribe en un
+    archivo JSON lines opcional y se muestra en consola como línea de
+    texto, como barra de progreso o nada (modo silencioso).
+    """
+
+    COUNTERS = ("generated", "skipped", "cached", "linked", "failed", "retried")
+    # Eventos que completan clips de salida (avanzan la barra de progreso)
+    CLIP_EVENTS = ("generated", "skipped", "cached", "linked", "failed")
+
+    def __init__(self, quiet: bool = False, progress: bool = False, debug: bool = False,
+                 events_file: Optional[str] = None):
+        """
+        Args:
+            quiet: No mostrar nada salvo errores y resúmenes finales
+            progress: Sustituir las líneas por clip por una barra de progreso
+            debug: Mostrar también los eventos de depuración
+            events_file: Archivo JSON lines donde registrar todos los eventos
+        """
+        self.quiet = quiet
+        self.progress = progress
+        self.debug = debug
+        self.lock = threading.Lock()
+        self.counters = {name: 0 for name in self.COUNTERS}
+        self.synthesis_latency = Histogram([0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10])
+        self.bytes_written = Histogram([1024, 4096, 16384, 65536, 262144, 1048576])
+        self.queue_depth = 0
+        self.queue_depth_max = 0
+        self.started = time.time()
+        self._bar: Optional[ProgressBar] = None
+        self._events = open(events_file, 'a', encoding='utf-8') if events_file else None
+
+    def emit(self, event: str, **fields):
+        """Registra un evento y actualiza las métricas asociadas"""
+        with self.lock:
+            if event in self.counters:
+                self.counters[event] += fields.get('clips', 1)
+            if event == "generated":
+                self.synthesis_latency.observe(fields.get('seconds', 0.0))
+                self.bytes_written.observe(fields.get('bytes', 0))
+            if self._events is not None:
+                record = {"event": event, "time": round(time.time(), 3), **fields}
+                self._events.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if self._bar is not None and event in self.CLIP_EVENTS:
+                self._bar.advance(fields.get('clips', 1))
+            self._print(event, fields)
+
+    def _print(self, event: str, fields: Dict[str, Any]):
+        """Representación en consola de un evento (llamado con el lock tomado)"""
+        name = os.path.basename(fields.get('file', ''))
+        if event == "failed":
+            # Los errores se muestran siempre
+            if self._bar is not None:
+                sys.stderr.write("\n")
+            print(f"  ✗ Error generando {fields.get('file')}: {fields.get('error')}")
+            return
+        if event == "breaker_open":
+            print(f"⛔ Demasiados errores ({fields['failures']} recientes): "
+                  f"pausando el pool {fields['cooldown']:g} segundos")
+            return
+        if self.quiet or (self._bar is not None and event != "info"):
+            return
+        if event == "debug" and not self.debug:
+            return
+        
+        if event == "skipped":
+            print(f"  ⭐️  {name} ya existe, saltando...")
+        elif event == "cached":
+            print(f"  ♻️  Desde caché: {name}")
+        elif event == "generated":
+            print(f"  ✓ Generado: {name}")
+        elif event == "linked":
+            print(f"  🔗 Enlazado: {name}")
+        elif event == "retried":
+            print(f"  🔁 Reintento {fields['attempt']}/{fields['max_retries']} de {name} "
+                  f"en {fields['backoff']:.1f}s ({fields['error']})")
+        elif event in ("info", "debug"):
+            print(fields['message'])
+
+    def info(self, message: str):
+        """Mensaje informativo (oculto en modo silencioso)"""
+        self.emit("info", message=message)
+
+    def debug_message(self, message: str):
+        """Mensaje de depuración (solo visible con debug)"""
+        if self.debug or self._events is not None:
+            self.emit("debug", message=message)
+
+    def queue_changed(self, delta: int):
+        """Actualiza la profundidad de la cola del pool concurrente"""
+        with self.lock:
+            self.queue_depth += delta
+            self.queue_depth_max = max(self.queue_depth_max, self.queue_depth)
+
+    def start_progress(self, total: int):
+        """Inicia la barra de progreso (si está activada) para total clips"""
+        if self.progress and not self.quiet:
+            with self.lock:
+                self._bar = ProgressBar(total)
+
+    def stop_progress(self):
+        with self.lock:
+            if self._bar is not None:
+                self._bar.close()
+                self._bar = None
+
+    def close(self):
+        self.stop_progress()
+        if self._events is not None:
+            self._events.close()
+            self._events = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Instantánea de todas las métricas"""
+        with self.lock:
+            return {
+                "elapsed_seconds": round(time.time() - self.started, 3),
+                "clips": dict(self.counters),
+                "synthesis_latency_seconds": self.synthesis_latency.to_dict(),
+                "bytes_written": self.bytes_written.to_dict(),
+                "queue_depth": self.queue_depth,
+                "queue_depth_max": self.queue_depth_max,
+            }
+
+    def to_prometheus(self) -> str:
+        """Métricas en formato de texto de Prometheus"""
+        snapshot = self.to_dict()
+        lines = [
+            "# HELP zhuyin_clips_total Clips procesados por resultado",
+            "# TYPE zhuyin_clips_total counter",
+        ]
+        for status, value in snapshot["clips"].items():
+            lines.append(f'zhuyin_clips_total{{status="{status}"}} {value}')
+        for metric, histogram, help_text in (
+            ("zhuyin_synthesis_latency_seconds", self.synthesis_latency, "Latencia de cada síntesis"),
+            ("zhuyin_bytes_written", self.bytes_written, "Bytes escritos por clip sintetizado"),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for upper, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'{metric}_bucket{{le="{upper:g}"}} {count}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f"{metric}_sum {histogram.sum:g}")
+            lines.append(f"{metric}_count {histogram.count}")
+        lines += [
+            "# HELP zhuyin_queue_depth Trabajos encolados en el pool",
+            "# TYPE zhuyin_queue_depth gauge",
+            f"zhuyin_queue_depth {snapshot['queue_depth']}",
+            f"zhuyin_queue_depth_max {snapshot['queue_depth_max']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Exporta las métricas: Prometheus si la extensión es .prom/.txt, si no JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            if path.endswith(('.prom', '.txt')):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+class AudioJob:
+    """Un texto único a sintetizar y todos los archivos que lo necesitan"""
+
+    def __init__(self, text: str, lang: str):
+        self.text = text
+        self.lang = lang
+        self.targets: List[str] = []
+        self.existing: Dict[str, bool] = {}
+
+    def add_target(self, filename: str, exists: Optional[bool] = None):
+        """Añade un destino (comprobando su existencia una sola vez si no se indica)"""
+        if filename not in self.existing:
+            self.targets.append(filename)
+            self.existing[filename] = os.path.exists(filename) if exists is None else exists
+
+    def invalidate(self, filename: str):
+        """Marca un destino como pendiente aunque exista en disco"""
+        self.existing[filename] = False
+
+    def missing_targets(self) -> List[str]:
+        """Destinos que todavía no existen en disco"""
+        return [t for t in self.targets if not self.existing[t]]
+
+
+class JobPlan:
+    """
+    Manifiesto de generación: agrupa los clips del mazo por (texto, idioma)
+
+    Palabras como 我, 的 o 是 aparecen en decenas de frases; el plan las
+    sintetiza una sola vez y replica el resultado a cada destino.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[tuple, AudioJob] = OrderedDict()
+        self.targets: Dict[str, AudioJob] = {}
+        self.total_entries = 0
+
+    def add(self, text: str, lang: str, filename: str, exists: Optional[bool] = None):
+        """Registra un clip del mazo en el plan"""
+        self.total_entries += 1
+        if filename in self.targets:
+            return
+        key = (text, lang)
+        job = self.jobs.get(key)
+        if job is None:
+            job = self.jobs[key] = AudioJob(text, lang)
+        job.add_target(filename, exists)
+        self.targets[filename] = job
+
+    def pending_jobs(self) -> List[AudioJob]:
+        """Trabajos con al menos un destino sin generar"""
+        return [job for job in self.jobs.values() if job.missing_targets()]
+
+    def synthesis_jobs(self) -> List[AudioJob]:
+        """Trabajos sin ningún destino en disco: los únicos que requieren síntesis"""
+        return [job for job in self.jobs.values() if not any(job.existing.values())]
+
+    def duplicate_ratio(self) -> float:
+        """Fracción de clips del mazo que no requieren síntesis propia"""
+        if not self.total_entries:
+            return 0.0
+        return 1 - len(self.jobs) / self.total_entries
+
+
+class TokenBucket:
+    """
+    Limitador de velocidad tipo token bucket compartido entre hilos
+
+    Cada request a gTTS consume un token; los tokens se reponen a `rate`
+    por segundo hasta un máximo de `capacity` (ráfaga permitida).
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: Requests por segundo permitidos
+            capacity: Tamaño máximo de ráfaga (por defecto max(1, rate))
+        """
+        if rate <= 0:
+            raise ValueError("rate debe ser mayor que 0")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Bloquea hasta que haya un token disponible y lo consume"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
 
 
 class ZhuyinAudioGenerator:
@@ -29,44 +2048,84 @@ class ZhuyinAudioGenerator:
         """
         self.json_file = json_file
         self.output_dir = Path(output_dir)
-        self.data = None
+        self.deck: Optional[DeckSource] = None
         self.delay = 1  # Delay entre requests para evitar rate limiting
+        self.workers = 1  # Hilos de síntesis concurrentes (1 = modo secuencial)
+        self.rate = None  # Límite de requests/segundo (None = derivado de delay)
         
-        # Crear directorios
-        self.create_directories()
-        
-    def create_directories(self):
-        """Crea la estructura de directorios para organizar los audios"""
-        directories = [
-            self.output_dir,
-            self.output_dir / "consonants" / "words",
-            self.output_dir / "consonants" / "sentences",
-            self.output_dir / "vowels" / "words", 
-            self.output_dir / "vowels" / "sentences",
-            self.output_dir / "tones" / "examples",
-            self.output_dir / "individual_words",
-            self.output_dir / "zhuyin_sounds"
-        ]
+        # Parámetros TTS (forman parte de la clave de caché)
+        self.slow = False
+        self.backend: TTSBackend = GTTSBackend()
+        self.cache: Optional[SynthesisCache] = SynthesisCache()
+        
+        # Tolerancia a fallos: reintentos con backoff exponencial y circuit breaker
+        self.max_retries = 3
+        self.backoff = 1.0  # Espera base (segundos) antes del primer reintento
+        self.backoff_max = 30.0
+        self.breaker = CircuitBreaker()
+        self.journal: Optional[JobJournal] = None
+        self.recorder: Optional['BenchmarkRecorder'] = None  # Solo durante --benchmark
+        self.metrics = GenerationMetrics()
+        self.writer = AtomicWriter()
+        
+        # Postprocesado opcional con ffmpeg (None = un proceso por núcleo)
+        self.postprocess_settings = dict(DEFAULT_POSTPROCESS_SETTINGS)
+        self.postprocess_workers: Optional[int] = None
+        
+        # Estado del pool de síntesis (solo activo dentro de worker_pool)
+        self.rate_limiter = None
+        self._executor = None
+        self._futures = []
+        self._pending = set()
+        # Los directorios de salida se crean al escribir el primer clip (AtomicWriter)
         
-        for directory in directories:
-            directory.mkdir(parents=True, exist_ok=True)
-            
     def load_data(self):
-        """Carga los datos desde el archivo JSON"""
+        """
+        Abre y valida el mazo (JSON o JSONL) sin cargarlo entero en memoria
+        
+        Todos los errores de esquema se informan juntos antes de empezar,
+        en lugar de fallar a mitad de la síntesis.
+        """
+        deck = DeckSource(self.json_file)
         try:
-            with open(self.json_file, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
-            print(f"✓ Datos cargados desde {self.json_file}")
+            counts, errors = deck.validate()
         except FileNotFoundError:
             print(f"✗ Error: No se encontró el archivo {self.json_file}")
             return False
-        except json.JSONDecodeError:
-            print(f"✗ Error: El archivo {self.json_file} no tiene un formato JSON válido")
+        except DeckFormatError as e:
+            print(f"✗ Error: El archivo {self.json_file} no tiene un formato JSON válido ({e})")
+            return False
+            
+        if errors:
+            print(f"✗ Error: El mazo {self.json_file} no cumple el esquema:")
+            for error in errors:
+                print(f"  - {error}")
+            return False
+            
+        self.deck = deck
+        print(f"✓ Datos cargados desde {self.json_file} ({counts['consonants']} consonantes, "
+              f"{counts['vowels']} vocales, {counts['tones']} tonos)")
+        return True
+        
+    def check_backend_ready(self) -> bool:
+        """Comprueba que el backend TTS puede usarse antes de empezar"""
+        if not self.backend.is_available():
+            requirements = f" Requiere {self.backend.requirements}." if self.backend.requirements else ""
+            print(f"✗ Error: El backend '{self.backend.name}' no está instalado en esta máquina.{requirements}")
+            return False
+        if not self.backend.requires_network:
+            return True
+        connected = self.backend.check_connection()
+        if connected is None:
+            connected = self.check_internet_connection()
+        if not connected:
+            print(f"✗ Error: No hay conexión a internet. {self.backend.name} requiere conexión a internet.")
             return False
         return True
         
     def check_internet_connection(self):
         """Verifica la conexión a internet"""
+        import requests
         try:
             requests.get("https://www.google.com", timeout=5)
             return True
@@ -87,7 +2146,10 @@ class ZhuyinAudioGenerator:
         
     def generate_audio(self, text: str, filename: str, lang: str = 'zh') -> bool:
         """
-        Genera un archivo de audio usando gTTS
+        Genera un archivo de audio usando el backend TTS configurado (gTTS por defecto)
+        
+        En modo concurrente (dentro de worker_pool) la síntesis se encola en
+        el pool y la función devuelve True en cuanto el trabajo queda encolado.
         
         Args:
             text: Texto a convertir en audio
@@ -95,177 +2157,674 @@ class ZhuyinAudioGenerator:
             lang: Código de idioma (zh para chino)
         
         Returns:
-            bool: True si el audio se generó exitosamente
+            bool: True si el audio se generó (o encoló) exitosamente
         """
+        # Agregar extensión .mp3
+        if not filename.endswith('.mp3'):
+            filename += '.mp3'
+            
+        # Si el archivo ya existe (o ya está encolado), saltarlo
+        if os.path.exists(filename) or filename in self._pending:
+            self.metrics.emit("skipped", file=filename)
+            return True
+            
+        if self._executor is not None:
+            self._pending.add(filename)
+            self._submit(self._synthesize, text, filename, lang)
+            return True
+            
+        return self._synthesize(text, filename, lang)
+        
+    def cache_key(self, text: str, lang: str) -> str:
+        """Clave de caché para un texto con los parámetros TTS actuales"""
+        return SynthesisCache.make_key(text, lang=lang, slow=self.slow, **self.backend.voice_params())
+        
+    def _synthesize(self, text: str, filename: str, lang: str) -> bool:
+        """Guarda en filename el audio de text, desde la caché o llamando al backend"""
         try:
-            # Agregar extensión .mp3
-            if not filename.endswith('.mp3'):
-                filename += '.mp3'
-                
-            # Si el archivo ya existe, saltarlo
-            if os.path.exists(filename):
-                print(f"  ⭐️  {os.path.basename(filename)} ya existe, saltando...")
+            key = self.cache_key(text, lang) if self.cache is not None else None
+            cached = self.cache.get(key) if key else None
+            if cached is not None:
+                started = time.perf_counter()
+                self.writer.link(str(cached), filename)
+                self._record("filesystem", time.perf_counter() - started)
+                self.metrics.emit("cached", file=filename)
                 return True
                 
-            tts = gTTS(text=text, lang=lang, slow=False)
-            tts.save(filename)
-            print(f"  ✓ Generado: {os.path.basename(filename)}")
+            synth_started = time.perf_counter()
+            data = self._synthesize_with_retries(text, lang, filename)
+            synth_seconds = time.perf_counter() - synth_started
+            started = time.perf_counter()
+            self.writer.write(filename, data)
+            if key:
+                self.cache.put(key, filename)
+            self._record("filesystem", time.perf_counter() - started)
+            self.metrics.emit("generated", file=filename, seconds=round(synth_seconds, 4), bytes=len(data))
             
-            # Pequeña pausa para evitar rate limiting
-            time.sleep(self.delay)
+            # Pequeña pausa para evitar rate limiting (solo sin limitador)
+            if self.rate_limiter is None:
+                time.sleep(self.delay)
             return True
             
         except Exception as e:
-            print(f"  ✗ Error generando {filename}: {str(e)}")
+            self.metrics.emit("failed", file=filename, error=str(e))
             return False
+            
+    def _synthesize_with_retries(self, text: str, lang: str, filename: str) -> bytes:
+        """
+        Llama al backend reintentando con backoff exponencial y jitter
+        
+        Cada intento respeta el limitador de velocidad y el circuit breaker
+        compartidos; tras agotar los reintentos se propaga el último error.
+        """
+        attempt = 0
+        while True:
+            self.breaker.wait()
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            started = time.perf_counter()
+            try:
+                data = self.backend.synthesize(text, lang, slow=self.slow)
+            except Exception as e:
+                self._record("synthesis", time.perf_counter() - started)
+                tripped = self.breaker.record(False)
+                if tripped:
+                    self.metrics.emit("breaker_open", failures=tripped, cooldown=self.breaker.cooldown)
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                backoff = min(self.backoff_max, self.backoff * 2 ** (attempt - 1))
+                backoff = random.uniform(backoff / 2, backoff)
+                self.metrics.emit("retried", file=filename, attempt=attempt, max_retries=self.max_retries,
+                                  backoff=round(backoff, 3), error=str(e))
+                time.sleep(backoff)
+                continue
+            self._record("synthesis", time.perf_counter() - started)
+            self.breaker.record(True)
+            return data
+            
+    def _record(self, kind: str, seconds: float):
+        """Anota un tiempo en el recorder del benchmark, si está activo"""
+        if self.recorder is not None:
+            self.recorder.add(kind, seconds)
+            
+    def _submit(self, fn, *args):
+        """Encola un trabajo en el pool llevando la cuenta de la profundidad de la cola"""
+        self.metrics.queue_changed(1)
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self.metrics.queue_changed(-1))
+        self._futures.append(future)
+        
+    def build_rate_limiter(self) -> Optional[TokenBucket]:
+        """
+        Crea el limitador compartido según workers/rate/delay
+        
+        Sin --rate y con un solo worker se mantiene la pausa fija de siempre.
+        """
+        if self.rate:
+            return TokenBucket(self.rate)
+        if self.workers > 1 and self.delay > 0:
+            return TokenBucket(1.0 / self.delay)
+        return None
+        
+    @contextmanager
+    def worker_pool(self):
+        """
+        Activa el pool de síntesis durante el bloque y espera a que termine
+        
+        Todas las llamadas a generate_audio dentro del bloque comparten el
+        mismo limitador de velocidad; con workers > 1 se ejecutan en paralelo.
+        """
+        self.rate_limiter = self.build_rate_limiter()
+        if self.workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tts")
+            self.metrics.info(f"⚡ Modo concurrente: {self.workers} workers, "
+                              f"{self.rate_limiter.rate if self.rate_limiter else '∞'} requests/s")
+        
+        interrupted = False
+        try:
+            yield
+        except KeyboardInterrupt:
+            interrupted = True
+            raise
+        finally:
+            executor, futures = self._executor, self._futures
+            try:
+                # El limitador sigue activo hasta que termina el último trabajo encolado
+                if executor is not None:
+                    if interrupted:
+                        executor.shutdown(wait=True, cancel_futures=True)
+                    else:
+                        wait(futures)
+                        executor.shutdown(wait=True)
+                        failed = sum(1 for f in futures if not f.result())
+                        if failed:
+                            self.metrics.info(f"⚠️  {failed} de {len(futures)} audios fallaron en el pool")
+            finally:
+                self._executor, self._futures, self._pending = None, [], set()
+                self.rate_limiter = None
+                # Lo escrito en el bloque queda en disco aunque se interrumpa
+                self.writer.flush()
     
     def get_appropriate_vowel_for_consonant(self, zhuyin_consonant):
         """
-        Devuelve la vocal apropiada para una consonante zhuyin específica
-        Corrige el problema de consonantes que no pueden combinarse con ㄚ
+        Devuelve la vocal apropiada para una consonante zhuyin específica
+        Corrige el problema de consonantes que no pueden combinarse con ㄚ
+        """
+        # Primera de ㄚ, ㄧ, ㄨ que forma una sílaba real según SYLLABLE_TABLE
+        # (ㄒ, ㄑ, ㄐ -> ㄧ: xi, qi, ji; ㄖ -> ㄨ: ru; el resto -> ㄚ)
+        initial = ZHUYIN_INITIALS.get(zhuyin_consonant)
+        vowel = next((SYLLABLE_FINALS[final] for final in ("a", "i", "u")
+                      if initial in SYLLABLE_TABLE[final].split()), 'ㄚ')
+        
+        # Debug: mostrar qué consonante estamos procesando (solo con --verbose)
+        if vowel != 'ㄚ':
+            self.metrics.debug_message(f"    🔧 DEBUG: Consonante especial detectada: '{zhuyin_consonant}' -> usando vocal '{vowel}'")
+            return vowel
+        else:
+            self.metrics.debug_message(f"    ✓ DEBUG: Consonante normal: '{zhuyin_consonant}' -> usando vocal 'ㄚ'")
+            return 'ㄚ'
+    
+    def zhuyin_sound_path(self, item: Dict[str, Any]) -> Path:
+        """Ruta del sonido zhuyin individual de una consonante o vocal"""
+        return self.output_dir / "zhuyin_sounds" / f"{self.sanitize_filename(item['zhuyin'])}_{item['pinyin']}.mp3"
+        
+    def word_path(self, category: str, card: Dict[str, Any]) -> Path:
+        """Ruta del audio de la palabra ejemplo de una tarjeta"""
+        word = card['example_word']
+        return self.output_dir / category / "words" / f"{self.sanitize_filename(card['zhuyin'])}_{self.sanitize_filename(word['characters'])}_{word['pinyin']}.mp3"
+        
+    def sentence_path(self, category: str, card: Dict[str, Any]) -> Path:
+        """Ruta del audio de la frase ejemplo (nombre truncado a 10 caracteres)"""
+        sentence = card['example_sentence']
+        return self.output_dir / category / "sentences" / f"{self.sanitize_filename(card['zhuyin'])}_{self.sanitize_filename(sentence['characters'][:10])}.mp3"
+        
+    def individual_word_path(self, word: Dict[str, Any]) -> Path:
+        """Ruta del audio de una palabra individual de una frase"""
+        return self.output_dir / "individual_words" / f"{self.sanitize_filename(word['characters'])}_{word['pinyin']}.mp3"
+        
+    def tone_path(self, tone: Dict[str, Any]) -> Path:
+        """Ruta del audio del ejemplo de un tono"""
+        example = tone['example']
+        return self.output_dir / "tones" / "examples" / f"tono_{tone['tone_number']}_{self.sanitize_filename(example['characters'])}_{example['pinyin']}.mp3"
+        
+    def syllable_path(self, syllable: Syllable) -> Path:
+        """Ruta del clip de una sílaba del inventario (pinyin numérico: lv4.mp3)"""
+        return self.output_dir / SYLLABLES_DIR / f"{syllable_pinyin(syllable, numeric=True)}.mp3"
+        
+    def iter_syllable_clips(self, tones=(1, 2, 3, 4)):
+        """Recorre el inventario de sílabas como pares (zhuyin con tono, archivo)"""
+        for syllable in iter_syllables(tones):
+            yield syllable_zhuyin(syllable), str(self.syllable_path(syllable))
+            
+    def iter_zhuyin_sound_clips(self):
+        """
+        Recorre los sonidos zhuyin individuales como pares (texto, archivo)
+        
+        Las consonantes usan la vocal apropiada (ㄒ, ㄑ, ㄐ + ㄧ; ㄖ + ㄨ; resto + ㄚ)
+        """
+        for consonant in self.deck.cards('consonants'):
+            zhuyin = consonant['zhuyin']
+            vowel = self.get_appropriate_vowel_for_consonant(zhuyin)
+            yield zhuyin + vowel, str(self.zhuyin_sound_path(consonant))
+            
+        for vowel in self.deck.cards('vowels'):
+            yield vowel['zhuyin'], str(self.zhuyin_sound_path(vowel))
+            
+    def iter_card_clips(self, category: str):
+        """
+        Recorre palabra ejemplo, frase ejemplo y palabras individuales de una categoría
+        
+        Args:
+            category: 'consonants' o 'vowels'
+        """
+        for card in self.deck.cards(category):
+            # Audio de la palabra ejemplo
+            yield card['example_word']['characters'], str(self.word_path(category, card))
+            
+            # Audio de la frase ejemplo
+            yield card['example_sentence']['characters'], str(self.sentence_path(category, card))
+            
+            # Audios de palabras individuales en la frase
+            for word_data in card['example_sentence']['words']:
+                yield word_data['characters'], str(self.individual_word_path(word_data))
+                
+    def iter_tone_clips(self):
+        """Recorre los ejemplos de tonos como pares (texto, archivo)"""
+        for tone in self.deck.cards('tones'):
+            yield tone['example']['characters'], str(self.tone_path(tone))
+            
+    def pipeline_stages(self) -> List[tuple]:
+        """Etapas del pipeline como pares (nombre, iterador de clips)"""
+        return [
+            ("zhuyin_sounds", self.iter_zhuyin_sound_clips()),
+            ("consonants", self.iter_card_clips('consonants')),
+            ("vowels", self.iter_card_clips('vowels')),
+            ("tones", self.iter_tone_clips()),
+        ]
+        
+    def iter_all_clips(self):
+        """Recorre todos los clips del mazo en el orden de generate_all_audios"""
+        for _, clips in self.pipeline_stages():
+            yield from clips
+        
+    def generate_syllables(self, tones=(1, 2, 3, 4), dry_run: bool = False) -> bool:
+        """
+        Genera el inventario completo de sílabas × tonos en syllables/ (modo --syllables)
+        
+        Las sílabas salen de SYLLABLE_TABLE; se planifican junto con los
+        sonidos zhuyin del mazo para reutilizar los clips que ya existan con
+        el mismo texto, y solo se sintetizan las que faltan en disco.
+        
+        Args:
+            tones: Tonos a incluir (5 = neutro)
+            dry_run: Solo mostrar el plan (--plan)
+        """
+        if not self.load_data():
+            return False
+            
+        clips = list(self.iter_syllable_clips(tones))
+        plan = self.build_plan(clips=itertools.chain(self.iter_zhuyin_sound_clips(), clips))
+        self.metrics.info(f"🔤 Inventario de sílabas: {len(clips)} clips ({len(clips) // len(tones)} sílabas × {len(tones)} tonos)")
+        if dry_run or not self.metrics.quiet:
+            self.print_plan(plan)
+        if dry_run:
+            return True
+        if not self.check_backend_ready():
+            return False
+            
+        start_time = time.time()
+        self.metrics.start_progress(len(plan.targets))
+        try:
+            with self.worker_pool():
+                self.execute_plan(plan)
+        finally:
+            self.metrics.stop_progress()
+            
+        present = OutputSnapshot(self.output_dir)
+        missing = sum(1 for _, filename in clips if not present.exists(filename))
+        self.build_asset_index()
+        print(f"\n✅ Sílabas listas en {time.time() - start_time:.1f} segundos: "
+              f"{len(clips) - missing} de {len(clips)} clips en {self.output_dir / SYLLABLES_DIR}")
+        if missing:
+            print(f"⚠️  {missing} sílabas fallaron; vuelve a ejecutar --syllables para reintentarlas")
+        return True
+        
+    def iter_composition_clips(self):
+        """
+        Recorre los clips que pueden componerse a partir de sílabas
+        
+        Usa el zhuyin_typing de cada palabra (las frases son la unión de sus
+        palabras) con el sandhi tonal aplicado. Los clips sin zhuyin_typing
+        válido no se incluyen y se sintetizan como siempre.
+        
+        Yields:
+            tuple: (texto, archivo, sílabas por palabra)
+        """
+        def words_of(entries: List[Dict[str, Any]]) -> Optional[List[List[Syllable]]]:
+            try:
+                parsed = [parse_zhuyin(entry['zhuyin_typing']) for entry in entries]
+            except (KeyError, TypeError, ValueError) as e:
+                self.metrics.debug_message(f"    ⚠️  DEBUG: No se puede componer '{entries[0].get('characters')}': {e}")
+                return None
+            if not all(parsed):
+                return None
+            characters = "".join(entry['characters'] for entry in entries)
+            flat = apply_tone_sandhi([s for word in parsed for s in word], characters)
+            words, position = [], 0
+            for word in parsed:
+                words.append(flat[position:position + len(word)])
+                position += len(word)
+            return words
+            
+        for category in ('consonants', 'vowels'):
+            for card in self.deck.cards(category):
+                sentence = card['example_sentence']
+                clips = [
+                    (card['example_word']['characters'], self.word_path(category, card), [card['example_word']]),
+                    (sentence['characters'], self.sentence_path(category, card), sentence['words']),
+                ] + [(word['characters'], self.individual_word_path(word), [word]) for word in sentence['words']]
+                for text, filename, entries in clips:
+                    words = words_of(entries) if entries else None
+                    if words:
+                        yield text, str(filename), words
+        for tone in self.deck.cards('tones'):
+            words = words_of([tone['example']])
+            if words:
+                yield tone['example']['characters'], str(self.tone_path(tone)), words
+                
+    def composition_key(self, words: List[List[Syllable]], gap: float, crossfade: float,
+                        contents: Optional[Dict[Syllable, Optional[bytes]]] = None) -> Optional[str]:
+        """
+        Clave de un clip compuesto (caché y lockfile): hash de sus sílabas y parámetros
+        
+        Args:
+            words: Sílabas por palabra
+            gap: Silencio entre palabras
+            crossfade: Fundido efectivo (0 si no se usó ffmpeg)
+            contents: Bytes ya leídos de cada sílaba (si no, se leen de syllables/)
+        
+        Returns:
+            str: Clave, o None si falta alguna sílaba
+        """
+        digests = []
+        for word in words:
+            row = []
+            for syllable in word:
+                if contents is not None:
+                    data = contents.get(syllable)
+                else:
+                    try:
+                        with open(self.syllable_path(syllable), 'rb') as f:
+                            data = f.read()
+                    except FileNotFoundError:
+                        data = None
+                if data is None:
+                    return None
+                row.append(hashlib.sha256(data).hexdigest())
+            digests.append(row)
+        return SynthesisCache.make_key("compose", gap=gap, crossfade=crossfade, parts=digests)
+        
+    def compose_audios(self, gap: float = 0.08, crossfade: float = 0.03, incremental: bool = False) -> bool:
+        """
+        Genera palabras y frases concatenando audio de sílabas (modo --compose)
+        
+        Solo se sintetizan por red las sílabas que faltan en syllables/ y
+        los clips que no pueden componerse. Cada clip compuesto se guarda en
+        la caché y en el lockfile con composition_key, derivada del
+        contenido de sus sílabas.
+        
+        Args:
+            gap: Silencio entre palabras de una frase (segundos)
+            crossfade: Fundido entre sílabas con ffmpeg (0 = concatenar tramas)
+            incremental: Volver a componer los clips cuyas sílabas o
+                parámetros cambiaron desde la última composición
+        """
+        if not self.load_data():
+            return False
+        start_time = time.time()
+        ffmpeg = shutil.which("ffmpeg") if crossfade > 0 else None
+        if crossfade > 0 and ffmpeg is None:
+            self.metrics.info("ℹ️  ffmpeg no está instalado: las sílabas se concatenan sin fundido")
+        effective_crossfade = crossfade if ffmpeg else 0
+            
+        snapshot = OutputSnapshot(self.output_dir)
+        lock = self.load_lockfile()
+        clips = list(self.iter_composition_clips())
+        if incremental:
+            stale = 0
+            for _, filename, words in clips:
+                entry = lock.entries.get(self.lock_key(filename))
+                if (snapshot.exists(filename) and entry is not None and 'compose' in entry
+                        and entry['hash'] != self.composition_key(words, gap, effective_crossfade)):
+                    os.remove(filename)
+                    snapshot.paths.discard(filename)
+                    stale += 1
+                    self.metrics.info(f"  🔄 Obsoleto: {os.path.basename(filename)}")
+            self.metrics.info(f"🔄 Modo incremental: {stale} clips compuestos obsoletos")
+        compositions = {filename: (text, words) for text, filename, words in clips
+                        if not snapshot.exists(filename)}
+        fallback = [(text, filename) for text, filename in self.iter_all_clips() if filename not in compositions]
+        needed = {s for _, words in compositions.values() for word in words for s in word}
+        syllable_clips = [(syllable_zhuyin(s), str(self.syllable_path(s))) for s in sorted(needed)]
+        
+        # Síntesis de red solo para sílabas ausentes y clips no componibles
+        plan = self.build_plan(clips=itertools.chain(fallback, syllable_clips))
+        self.metrics.info(f"🧩 Composición: {len(compositions)} clips a partir de {len(needed)} sílabas")
+        if not self.metrics.quiet:
+            self.print_plan(plan)
+        regenerated = {t for job in plan.jobs.values() for t in job.missing_targets()}
+        if plan.pending_jobs():
+            if plan.synthesis_jobs() and not self.check_backend_ready():
+                return False
+            self.metrics.start_progress(len(plan.targets))
+            try:
+                with self.worker_pool():
+                    self.execute_plan(plan)
+            finally:
+                self.metrics.stop_progress()
+                
+        # Componer en paralelo (con ffmpeg cada fundido es un subproceso)
+        syllable_bytes: Dict[Syllable, Optional[bytes]] = {}
+        for syllable in needed:
+            try:
+                with open(self.syllable_path(syllable), 'rb') as f:
+                    syllable_bytes[syllable] = f.read()
+            except FileNotFoundError:
+                syllable_bytes[syllable] = None
+                
+        def compose(filename: str, words: List[List[Syllable]]) -> Optional[str]:
+            key = self.composition_key(words, gap, effective_crossfade, syllable_bytes)
+            if key is None:
+                self.metrics.emit("failed", file=filename, error="faltan sílabas")
+                return None
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                self.writer.link(str(cached), filename)
+                self.metrics.emit("cached", file=filename)
+                return key
+            parts = [[syllable_bytes[s] for s in word] for word in words]
+            try:
+                data = concat_mp3(parts, gap, crossfade, ffmpeg)
+            except subprocess.CalledProcessError as e:
+                self.metrics.emit("failed", file=filename, error=e.stderr.decode('utf-8', 'replace').strip())
+                return None
+            self.writer.write(filename, data)
+            if self.cache is not None:
+                self.cache.put(key, filename)
+            self.metrics.emit("generated", file=filename, bytes=len(data), composed=True)
+            return key
+            
+        with ThreadPoolExecutor(max_workers=os.cpu_count() if ffmpeg else 1) as pool:
+            results = list(pool.map(lambda item: compose(item[0], item[1][1]), compositions.items()))
+        self.writer.flush()
+        
+        # Registrar en el lockfile (sin las sílabas, que no forman parte del mazo) con la
+        # clave de composición: --incremental y --verify la usan en lugar de la de TTS
+        present = OutputSnapshot(self.output_dir)
+        for (filename, (text, _)), key in zip(compositions.items(), results):
+            if key is not None and present.exists(filename):
+                lock.entries[self.lock_key(filename)] = {
+                    "hash": key, "text": text, "compose": {"gap": gap, "crossfade": effective_crossfade}}
+        self.update_lockfile(self.build_plan(clips=fallback), lock, regenerated)
+        
+        composed = sum(1 for key in results if key is not None)
+        self.build_asset_index()
+        print(f"\n✅ Composición completada en {time.time() - start_time:.1f} segundos: "
+              f"{composed} de {len(compositions)} clips compuestos")
+        if composed < len(results):
+            print(f"⚠️  {len(results) - composed} clips no pudieron componerse")
+        return True
+        
+    def build_plan(self, lang: str = 'zh', known: Optional[Dict[str, bool]] = None, clips=None) -> 'JobPlan':
+        """
+        Expande el mazo en un manifiesto de trabajos sin llamar a la red
+        
+        Cada texto único se convierte en un AudioJob con todos sus destinos;
+        la existencia de cada destino se comprueba una sola vez.
+        
+        Args:
+            lang: Código de idioma de la síntesis
+            known: Estado de cada destino (ruta relativa -> completo) según el
+                diario de trabajos; si no, se usa una única pasada de os.scandir
+            clips: Pares (texto, archivo) a planificar (por defecto todo el mazo)
         """
-        # Consonantes que NO pueden usar ㄚ (a) porque crean combinaciones inexistentes
-        special_vowels = {
-            'ㄒ': 'ㄧ',  # xi (x + i) - natural en chino
-            'ㄑ': 'ㄧ',  # qi (q + i) - natural en chino
-            'ㄐ': 'ㄧ',  # ji (j + i) - natural en chino
-            'ㄖ': 'ㄨ',  # ru (r + u) - más natural que ra
-        }
+        plan = JobPlan()
+        snapshot = OutputSnapshot(self.output_dir) if known is None else None
+        for text, filename in (self.iter_all_clips() if clips is None else clips):
+            if known is None:
+                exists = snapshot.exists(filename)
+            else:
+                exists = known.get(self.lock_key(filename), False)
+            plan.add(text, lang, filename, exists)
+        return plan
         
-        # Debug: mostrar qué consonante estamos procesando
-        if zhuyin_consonant in special_vowels:
-            vowel = special_vowels[zhuyin_consonant]
-            print(f"    🔧 DEBUG: Consonante especial detectada: '{zhuyin_consonant}' -> usando vocal '{vowel}'")
-            return vowel
-        else:
-            print(f"    ✓ DEBUG: Consonante normal: '{zhuyin_consonant}' -> usando vocal 'ㄚ'")
-            return 'ㄚ'
-    
-    def generate_zhuyin_sounds(self):
-        """Genera audios para los sonidos individuales de zhuyin - VERSIÓN CORREGIDA"""
-        print("\n🔊 Generando audios para sonidos zhuyin individuales...")
-        print("🎯 Corrigiendo consonantes problemáticas: ㄒ, ㄑ, ㄐ, ㄖ")
-        print("🔍 Activando modo DEBUG para verificar procesamiento...")
+    def is_cached(self, text: str, lang: str) -> bool:
+        """Indica si el texto ya está en la caché (sin contarlo como acierto)"""
+        return self.cache is not None and self.cache.path_for(self.cache_key(text, lang)).exists()
         
-        # Consonantes - CORREGIDO: Usa vocal apropiada para cada consonante
-        consonant_count = 0
-        special_count = 0
+    def estimate_plan_time(self, plan: 'JobPlan') -> float:
+        """Estima la duración en segundos de la síntesis pendiente del plan"""
+        pending = sum(1 for job in plan.synthesis_jobs() if not self.is_cached(job.text, job.lang))
+        limiter = self.build_rate_limiter()
+        if limiter is not None:
+            return max(pending / limiter.rate, pending * self.backend.estimated_latency / self.workers)
+        return pending * (self.backend.estimated_latency + self.delay)
         
-        for consonant in self.data['zhuyin_system']['consonants']:
-            zhuyin = consonant['zhuyin']
-            pinyin = consonant['pinyin']
-            consonant_count += 1
-            
-            filename = self.output_dir / "zhuyin_sounds" / f"{self.sanitize_filename(zhuyin)}_{pinyin}.mp3"
-            
-            # Usar función dedicada para obtener la vocal correcta
-            vowel = self.get_appropriate_vowel_for_consonant(zhuyin)
-            consonant_sound = zhuyin + vowel
-            
-            if vowel != 'ㄚ':
-                special_count += 1
-                print(f"  🎵 [{consonant_count}] ESPECIAL: {zhuyin} ({pinyin}) como '{consonant_sound}'")
-            else:
-                print(f"  🎵 [{consonant_count}] Normal: {zhuyin} ({pinyin}) como '{consonant_sound}'")
-            
-            self.generate_audio(consonant_sound, str(filename))
+    def print_plan(self, plan: 'JobPlan'):
+        """Muestra el resumen del manifiesto (modo --plan)"""
+        pending = plan.pending_jobs()
+        synthesis = plan.synthesis_jobs()
+        missing_targets = sum(len(job.missing_targets()) for job in synthesis)
+        cached = sum(1 for job in synthesis if self.is_cached(job.text, job.lang))
         
-        print(f"\n📊 Resumen: {special_count} consonantes especiales de {consonant_count} totales")
-            
-        # Vocales - mantener el comportamiento correcto existente
-        print("\n🔊 Generando audios para vocales...")
-        for vowel in self.data['zhuyin_system']['vowels']:
-            zhuyin = vowel['zhuyin']
-            pinyin = vowel['pinyin']
-            
-            filename = self.output_dir / "zhuyin_sounds" / f"{self.sanitize_filename(zhuyin)}_{pinyin}.mp3"
-            print(f"  🎵 Generando vocal {zhuyin} ({pinyin}) usando carácter zhuyin '{zhuyin}'")
-            self.generate_audio(zhuyin, str(filename))
-            
-    def generate_consonant_audios(self):
-        """Genera audios para consonantes, sus palabras y frases"""
-        print("\n🔊 Generando audios para consonantes...")
+        print("🗂️  Plan de generación")
+        print("=" * 60)
+        print(f"📄 Clips en el mazo:        {plan.total_entries}")
+        print(f"📁 Archivos de salida:      {len(plan.targets)}")
+        print(f"🔤 Textos únicos (trabajos): {len(plan.jobs)}")
+        print(f"♻️  Ratio de duplicados:     {plan.duplicate_ratio():.1%}")
+        print(f"⭐️ Trabajos ya completos:   {len(plan.jobs) - len(pending)}")
+        print(f"🎵 Síntesis pendientes:     {len(synthesis)} ({missing_targets} archivos)")
+        print(f"🔗 Solo enlaces:            {len(pending) - len(synthesis)} (el audio ya existe en disco)")
+        print(f"♻️  Disponibles en caché:    {cached}")
+        print(f"⏱️  Tiempo estimado:         {self.estimate_plan_time(plan):.1f} segundos")
+        print("=" * 60)
         
-        consonants = self.data['zhuyin_system']['consonants']
-        total = len(consonants)
+    def load_lockfile(self) -> AudioLockfile:
+        """Carga el lockfile del directorio de salida"""
+        return AudioLockfile(self.output_dir / LOCKFILE_NAME).load()
         
-        for i, consonant in enumerate(consonants, 1):
-            zhuyin = consonant['zhuyin']
-            pinyin = consonant['pinyin']
-            
-            print(f"\n[{i}/{total}] Procesando consonante {zhuyin} ({pinyin})")
-            
-            # Audio de la palabra ejemplo
-            word = consonant['example_word']
-            word_filename = self.output_dir / "consonants" / "words" / f"{self.sanitize_filename(zhuyin)}_{self.sanitize_filename(word['characters'])}_{word['pinyin']}.mp3"
-            self.generate_audio(word['characters'], str(word_filename))
-            
-            # Audio de la frase ejemplo
-            sentence = consonant['example_sentence']
-            sentence_filename = self.output_dir / "consonants" / "sentences" / f"{self.sanitize_filename(zhuyin)}_{self.sanitize_filename(sentence['characters'][:10])}.mp3"
-            self.generate_audio(sentence['characters'], str(sentence_filename))
-            
-            # Audios de palabras individuales en la frase
-            for word_data in sentence['words']:
-                individual_filename = self.output_dir / "individual_words" / f"{self.sanitize_filename(word_data['characters'])}_{word_data['pinyin']}.mp3"
-                self.generate_audio(word_data['characters'], str(individual_filename))
-                
-    def generate_vowel_audios(self):
-        """Genera audios para vocales, sus palabras y frases"""
-        print("\n🔊 Generando audios para vocales...")
+    def lock_key(self, filename: str) -> str:
+        """Ruta de un clip relativa a output_dir, tal como se guarda en el lockfile"""
+        return Path(filename).relative_to(self.output_dir).as_posix()
         
-        vowels = self.data['zhuyin_system']['vowels']
-        total = len(vowels)
+    def apply_incremental(self, plan: 'JobPlan', lock: AudioLockfile, dry_run: bool = False) -> tuple:
+        """
+        Compara el plan con el lockfile (modo --incremental)
         
-        for i, vowel in enumerate(vowels, 1):
-            zhuyin = vowel['zhuyin']
-            pinyin = vowel['pinyin']
-            
-            print(f"\n[{i}/{total}] Procesando vocal {zhuyin} ({pinyin})")
-            
-            # Audio de la palabra ejemplo
-            word = vowel['example_word']
-            word_filename = self.output_dir / "vowels" / "words" / f"{self.sanitize_filename(zhuyin)}_{self.sanitize_filename(word['characters'])}_{word['pinyin']}.mp3"
-            self.generate_audio(word['characters'], str(word_filename))
-            
-            # Audio de la frase ejemplo
-            sentence = vowel['example_sentence']
-            sentence_filename = self.output_dir / "vowels" / "sentences" / f"{self.sanitize_filename(zhuyin)}_{self.sanitize_filename(sentence['characters'][:10])}.mp3"
-            self.generate_audio(sentence['characters'], str(sentence_filename))
-            
-            # Audios de palabras individuales en la frase
-            for word_data in sentence['words']:
-                individual_filename = self.output_dir / "individual_words" / f"{self.sanitize_filename(word_data['characters'])}_{word_data['pinyin']}.mp3"
-                self.generate_audio(word_data['characters'], str(individual_filename))
-                
-    def generate_tone_audios(self):
-        """Genera audios para ejemplos de tonos"""
-        print("\n🔊 Generando audios para ejemplos de tonos...")
+        Marca como pendientes los clips cuyo texto o parámetros TTS cambiaron
+        y elimina los clips huérfanos que ya no aparecen en el mazo. Sin
+        lockfile previo se confía en los archivos existentes.
         
-        tones = self.data['zhuyin_system']['tones']
+        Args:
+            plan: Plan construido con build_plan
+            lock: Lockfile de la ejecución anterior
+            dry_run: Solo contar, sin borrar archivos (para --plan)
         
-        for tone in tones:
-            tone_num = tone['tone_number']
-            description = tone['description']
-            example = tone['example']
+        Returns:
+            tuple: (clips obsoletos, clips huérfanos)
+        """
+        if not lock.exists:
+            return 0, 0
             
-            print(f"\nProcesando tono {tone_num}: {description}")
+        stale = 0
+        compositions = None
+        for filename, job in plan.targets.items():
+            if not job.existing[filename]:
+                continue
+            entry = lock.entries.get(self.lock_key(filename))
+            if entry is not None and 'compose' in entry:
+                # Clip compuesto (--compose): obsoleto si cambiaron sus sílabas
+                if compositions is None:
+                    compositions = {f: words for _, f, words in self.iter_composition_clips()}
+                words = compositions.get(filename)
+                expected = self.composition_key(words, **entry['compose']) if words else None
+            else:
+                expected = self.cache_key(job.text, job.lang)
+            if entry is None or entry.get('hash') != expected:
+                stale += 1
+                job.invalidate(filename)
+                if not dry_run:
+                    os.remove(filename)
+                    self.metrics.info(f"  🔄 Obsoleto: {os.path.basename(filename)}")
+                    
+        current = {self.lock_key(filename) for filename in plan.targets}
+        orphans = 0
+        for relative in list(lock.entries):
+            if relative in current:
+                continue
+            orphans += 1
+            if not dry_run:
+                orphan = self.output_dir / relative
+                if orphan.exists():
+                    orphan.unlink()
+                    self.metrics.info(f"  🗑️  Huérfano eliminado: {relative}")
+                del lock.entries[relative]
+        return stale, orphans
+        
+    def update_lockfile(self, plan: 'JobPlan', lock: AudioLockfile, regenerated: set):
+        """
+        Registra en el lockfile los clips presentes tras la ejecución
+        
+        Los clips regenerados (o sin entrada previa) se anotan con el hash
+        actual; los que se saltaron conservan su entrada anterior.
+        """
+        present = OutputSnapshot(self.output_dir)
+        for filename, job in plan.targets.items():
+            relative = self.lock_key(filename)
+            if not present.exists(filename):
+                lock.entries.pop(relative, None)
+            elif filename in regenerated or relative not in lock.entries:
+                lock.entries[relative] = {"hash": self.cache_key(job.text, job.lang), "text": job.text}
+        lock.save()
+        
+    def execute_plan(self, plan: 'JobPlan'):
+        """
+        Sintetiza una vez cada texto pendiente y lo replica a todos sus destinos
+        
+        Si algún destino ya existe se reutiliza como origen y no hay síntesis.
+        """
+        for job in plan.jobs.values():
+            missing = job.missing_targets()
+            if not missing:
+                self.metrics.emit("skipped", file=job.targets[0], clips=len(job.targets))
+                continue
+            if self._executor is not None:
+                self._submit(self._run_job, job, missing)
+            else:
+                self._run_job(job, missing)
+                
+    def _run_job(self, job: 'AudioJob', missing: List[str]) -> bool:
+        """Ejecuta un AudioJob: síntesis (si hace falta) y enlace a los destinos"""
+        started = time.perf_counter()
+        existing = [t for t in job.targets if t not in missing]
+        if existing:
+            source = existing[0]
+        else:
+            source = missing.pop(0)
+            if not self._synthesize(job.text, source, job.lang):
+                # Los destinos que iban a enlazarse a este clip también fallan
+                for target in missing:
+                    self.metrics.emit("failed", file=target, error=f"no se generó {source}")
+                if self.journal is not None:
+                    self.journal.append("failed", targets=[self.lock_key(t) for t in [source] + missing])
+                return False
+            missing_done = [source]
+        linking = time.perf_counter()
+        for target in missing:
+            self.writer.link(source, target)
+            self.metrics.emit("linked", file=target)
+        if self.recorder is not None:
+            self._record("filesystem", time.perf_counter() - linking)
+            self.recorder.clip(time.perf_counter() - started)
             
-            filename = self.output_dir / "tones" / "examples" / f"tono_{tone_num}_{self.sanitize_filename(example['characters'])}_{example['pinyin']}.mp3"
-            self.generate_audio(example['characters'], str(filename))
+        if self.journal is not None:
+            done = missing if existing else missing_done + missing
+            self.journal.append("done", targets=[self.lock_key(t) for t in done])
+        return True
             
     def regenerate_consonant_sounds_only(self):
         """Regenera solo los sonidos de consonantes usando zhuyin"""
         if not self.load_data():
             return False
             
-        if not self.check_internet_connection():
-            print("✗ Error: No hay conexión a internet. gTTS requiere conexión a internet.")
+        if not self.check_backend_ready():
             return False
             
-        print("🔧 Regenerando TODOS los sonidos de consonantes usando zhuyin...")
-        print("🎯 Corrigiendo consonantes problemáticas: ㄒ, ㄑ, ㄐ, ㄖ")
-        print("🔍 Activando modo DEBUG para verificar procesamiento...")
+        self.metrics.info("🔧 Regenerando TODOS los sonidos de consonantes usando zhuyin...")
+        self.metrics.info("🎯 Corrigiendo consonantes problemáticas: ㄒ, ㄑ, ㄐ, ㄖ")
+        self.metrics.info("🔍 Activando modo DEBUG para verificar procesamiento...")
         
         # Crear directorio si no existe
         sounds_dir = self.output_dir / "zhuyin_sounds"
@@ -274,33 +2833,35 @@ class ZhuyinAudioGenerator:
         consonant_count = 0
         special_count = 0
         
-        # Regenerar todas las consonantes usando lógica corregida
-        for consonant in self.data['zhuyin_system']['consonants']:
-            zhuyin = consonant['zhuyin']
-            pinyin = consonant['pinyin']
-            consonant_count += 1
+        with self.worker_pool():
+            # Regenerar todas las consonantes usando lógica corregida
+            for consonant in self.deck.cards('consonants'):
+                zhuyin = consonant['zhuyin']
+                pinyin = consonant['pinyin']
+                consonant_count += 1
             
-            filename = sounds_dir / f"{self.sanitize_filename(zhuyin)}_{pinyin}.mp3"
+                filename = self.zhuyin_sound_path(consonant)
             
-            # Eliminar archivo existente si existe
-            if filename.exists():
-                filename.unlink()
-                print(f"  🗑️  Eliminado archivo previo: {filename.name}")
+                # Eliminar archivo existente si existe
+                if filename.exists():
+                    filename.unlink()
+                    self.metrics.info(f"  🗑️  Eliminado archivo previo: {filename.name}")
             
-            # Usar función dedicada para obtener la vocal correcta
-            vowel = self.get_appropriate_vowel_for_consonant(zhuyin)
-            consonant_sound = zhuyin + vowel
+                # Usar función dedicada para obtener la vocal correcta
+                vowel = self.get_appropriate_vowel_for_consonant(zhuyin)
+                consonant_sound = zhuyin + vowel
             
-            if vowel != 'ㄚ':
-                special_count += 1
-                print(f"  🎵 [{consonant_count}] REGENERANDO ESPECIAL: {zhuyin} ({pinyin}) como '{consonant_sound}'")
-            else:
-                print(f"  🎵 [{consonant_count}] Regenerando normal: {zhuyin} ({pinyin}) como '{consonant_sound}'")
+                if vowel != 'ㄚ':
+                    special_count += 1
+                    self.metrics.info(f"  🎵 [{consonant_count}] REGENERANDO ESPECIAL: {zhuyin} ({pinyin}) como '{consonant_sound}'")
+                else:
+                    self.metrics.info(f"  🎵 [{consonant_count}] Regenerando normal: {zhuyin} ({pinyin}) como '{consonant_sound}'")
                 
-            self.generate_audio(consonant_sound, str(filename))
+                self.generate_audio(consonant_sound, str(filename))
         
-        print(f"\n📊 Resumen: {special_count} consonantes especiales de {consonant_count} totales")
-        print("✅ Regeneración de consonantes completada!")
+        self.build_asset_index()
+        self.metrics.info(f"\n📊 Resumen: {special_count} consonantes especiales de {consonant_count} totales")
+        self.metrics.info("✅ Regeneración de consonantes completada!")
         return True
             
     def regenerate_vowel_sounds_only(self):
@@ -308,32 +2869,33 @@ class ZhuyinAudioGenerator:
         if not self.load_data():
             return False
             
-        if not self.check_internet_connection():
-            print("✗ Error: No hay conexión a internet. gTTS requiere conexión a internet.")
+        if not self.check_backend_ready():
             return False
             
-        print("🔊 Regenerando SOLO los sonidos de vocales zhuyin...")
+        self.metrics.info("🔊 Regenerando SOLO los sonidos de vocales zhuyin...")
         
         # Crear directorio si no existe
         sounds_dir = self.output_dir / "zhuyin_sounds"
         sounds_dir.mkdir(parents=True, exist_ok=True)
         
-        # Regenerar solo las vocales
-        for vowel in self.data['zhuyin_system']['vowels']:
-            zhuyin = vowel['zhuyin']
-            pinyin = vowel['pinyin']
+        with self.worker_pool():
+            # Regenerar solo las vocales
+            for vowel in self.deck.cards('vowels'):
+                zhuyin = vowel['zhuyin']
+                pinyin = vowel['pinyin']
             
-            filename = sounds_dir / f"{self.sanitize_filename(zhuyin)}_{pinyin}.mp3"
+                filename = self.zhuyin_sound_path(vowel)
             
-            # Eliminar archivo existente si existe
-            if filename.exists():
-                filename.unlink()
-                print(f"  🗑️  Eliminado archivo previo: {filename.name}")
+                # Eliminar archivo existente si existe
+                if filename.exists():
+                    filename.unlink()
+                    self.metrics.info(f"  🗑️  Eliminado archivo previo: {filename.name}")
             
-            print(f"  🎵 Regenerando vocal {zhuyin} ({pinyin}) usando carácter zhuyin '{zhuyin}'")
-            self.generate_audio(zhuyin, str(filename))
-            
-        print("✅ Regeneración de vocales completada!")
+                self.metrics.info(f"  🎵 Regenerando vocal {zhuyin} ({pinyin}) usando carácter zhuyin '{zhuyin}'")
+                self.generate_audio(zhuyin, str(filename))
+
+        self.build_asset_index()
+        self.metrics.info("✅ Regeneración de vocales completada!")
         return True
     
     def test_consonant_vowel_mapping(self):
@@ -347,7 +2909,7 @@ class ZhuyinAudioGenerator:
         special_count = 0
         total_count = 0
         
-        for consonant in self.data['zhuyin_system']['consonants']:
+        for consonant in self.deck.cards('consonants'):
             zhuyin = consonant['zhuyin']
             pinyin = consonant['pinyin']
             total_count += 1
@@ -375,34 +2937,77 @@ class ZhuyinAudioGenerator:
             
         return True
             
-    def generate_all_audios(self):
-        """Genera todos los audios"""
+    def generate_all_audios(self, incremental: bool = False, resume: bool = False):
+        """
+        Genera todos los audios
+        
+        Args:
+            incremental: Regenerar solo los clips nuevos o cuyo texto cambió
+                según el lockfile, y eliminar los huérfanos
+            resume: Continuar una ejecución interrumpida según el diario de
+                trabajos, sin volver a comprobar cada archivo
+        """
         if not self.load_data():
             return False
             
-        if not self.check_internet_connection():
-            print("✗ Error: No hay conexión a internet. gTTS requiere conexión a internet.")
+        if not self.check_backend_ready():
             return False
             
-        print("🎵 Iniciando generación de audios para Zhuyin/Bopomofo (VERSIÓN DEFINITIVA)")
-        print(f"📁 Los audios se guardarán en: {self.output_dir.absolute()}")
-        print("🎯 Usando SIEMPRE caracteres zhuyin con vocales fonéticamente correctas")
-        print("🔧 Corrigiendo ㄒ, ㄑ, ㄐ (con ㄧ) y ㄖ (con ㄨ)")
+        self.metrics.info("🎵 Iniciando generación de audios para Zhuyin/Bopomofo (VERSIÓN DEFINITIVA)")
+        self.metrics.info(f"📁 Los audios se guardarán en: {self.output_dir.absolute()}")
+        self.metrics.info("🎯 Usando SIEMPRE caracteres zhuyin con vocales fonéticamente correctas")
+        self.metrics.info("🔧 Corrigiendo ㄒ, ㄑ, ㄐ (con ㄧ) y ㄖ (con ㄨ)")
         
         start_time = time.time()
         
+        lock = self.load_lockfile()
+        journal = JobJournal(self.output_dir / JOURNAL_NAME)
+        known = journal.read() if resume else None
+        if resume:
+            if known is None:
+                self.metrics.info("⚠️  No hay diario de una ejecución previa; se comprobarán los archivos en disco")
+            else:
+                self.metrics.info(f"⏯️  Reanudando: {sum(known.values())} clips completados según el diario")
+        
         try:
-            # Generar audios por categorías
-            self.generate_zhuyin_sounds()
-            self.generate_consonant_audios()
-            self.generate_vowel_audios()
-            self.generate_tone_audios()
+            # Planificar todo el mazo antes de la primera llamada a la red
+            plan = self.build_plan(known=known)
+            if incremental:
+                stale, orphans = self.apply_incremental(plan, lock)
+                self.metrics.info(f"🔄 Modo incremental: {stale} clips obsoletos, {orphans} huérfanos eliminados")
+            if not self.metrics.quiet:
+                self.print_plan(plan)
+            regenerated = {t for job in plan.jobs.values() for t in job.missing_targets()}
+            
+            journal.open(resume=known is not None)
+            journal.append("plan", existing=[self.lock_key(t) for t, job in plan.targets.items() if job.existing[t]])
+            self.journal = journal
+            
+            # Sintetizar cada texto único una vez (compartiendo pool y limitador)
+            self.metrics.start_progress(len(plan.targets))
+            try:
+                with self.worker_pool():
+                    self.execute_plan(plan)
+            finally:
+                # Registrar incluso lo completado antes de una interrupción
+                self.metrics.stop_progress()
+                self.journal = None
+                journal.close()
+                self.update_lockfile(plan, lock, regenerated)
+            
+            failed = [t for t, ok in journal.read().items() if not ok]
+            if failed:
+                print(f"\n⚠️  {len(failed)} clips fallaron tras {self.max_retries} reintentos; "
+                      "ejecuta con --resume para reintentarlos")
             
             elapsed_time = time.time() - start_time
             print(f"\n✅ ¡Generación completada en {elapsed_time:.1f} segundos!")
+            if self.cache is not None:
+                print(f"♻️  Caché: {self.cache.hits} aciertos, {self.cache.misses} síntesis nuevas")
             print(f"📁 Todos los audios se han guardado en: {self.output_dir.absolute()}")
             
-            # Mostrar estadísticas
+            # Índice de assets y estadísticas
+            self.build_asset_index()
             self.show_statistics()
             
         except KeyboardInterrupt:
@@ -414,17 +3019,453 @@ class ZhuyinAudioGenerator:
             
         return True
         
+    def iter_output_clips(self):
+        """
+        Recorre los MP3 del directorio de salida agrupados por categoría
+        
+        Yields:
+            tuple: (categoría relativa, lista ordenada de os.DirEntry)
+        """
+        for root, dirs, files in os.walk(self.output_dir):
+            dirs[:] = sorted(d for d in dirs if d != SPRITES_DIR)
+            entries = sorted((e for e in os.scandir(root) if e.name.endswith('.mp3') and e.is_file()),
+                             key=lambda e: e.name)
+            if entries:
+                yield Path(root).relative_to(self.output_dir).as_posix(), entries
+                
+    def archive_path(self) -> Path:
+        """Ruta por defecto del archivo empaquetado (junto a output_dir)"""
+        return self.output_dir.with_name(self.output_dir.name + ARCHIVE_SUFFIX)
+        
+    def build_archive(self, target: Optional[str] = None) -> Dict[str, int]:
+        """
+        Empaqueta output_dir en un único archivo indexado (modo --pack)
+        
+        Incluye clips, sprites e índice de assets; deja fuera el lockfile,
+        el diario y el estado del postprocesado, que solo usa la generación.
+        
+        Args:
+            target: Ruta del archivo (por defecto archive_path())
+        """
+        target = Path(target) if target else self.archive_path()
+        stats = write_audio_archive(self.output_dir, target)
+        stats["path"] = str(target)
+        return stats
+        
+    def build_sprites(self) -> Dict[str, int]:
+        """
+        Empaqueta los clips de cada categoría en un sprite de audio
+        
+        Concatena las tramas MP3 de todos los clips de una carpeta en
+        sprites/<categoría>.mp3 y escribe sprites/sprites.json con el
+        desplazamiento en bytes y la posición en segundos de cada clip,
+        indexado por su ruta relativa (la misma que construyen los
+        generate_* y script.js). Solo se reempaquetan las categorías
+        cuyos clips cambiaron desde el último empaquetado.
+        
+        Returns:
+            dict: Número de sprites reempaquetados, reutilizados y eliminados
+        """
+        sprites_dir = self.output_dir / SPRITES_DIR
+        index_path = sprites_dir / SPRITE_INDEX_NAME
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            index = {}
+        old_sprites = index.get('sprites', {})
+        old_clips = index.get('clips', {})
+        sprites, clips = {}, {}
+        stats = {"packed": 0, "reused": 0, "removed": 0}
+        
+        for category, entries in self.iter_output_clips():
+            name = category.replace('/', '_')
+            
+            # Huella de cada clip: se reutiliza el hash si tamaño y mtime no cambiaron
+            sources = {}
+            for entry in entries:
+                relative = f"{category}/{entry.name}"
+                st = entry.stat()
+                prior = old_clips.get(relative)
+                if prior and prior.get('size') == st.st_size and prior.get('mtime_ns') == st.st_mtime_ns:
+                    digest = prior['hash']
+                else:
+                    with open(entry.path, 'rb') as f:
+                        digest = hashlib.sha256(f.read()).hexdigest()
+                sources[relative] = (digest, st)
+            signature = hashlib.sha256("\n".join(f"{r}:{d}" for r, (d, _) in sources.items()).encode('utf-8')).hexdigest()
+            
+            sprite_file = sprites_dir / f"{name}.mp3"
+            previous = old_sprites.get(name)
+            if previous and previous.get('signature') == signature and sprite_file.exists():
+                sprites[name] = previous
+                clips.update((r, old_clips[r]) for r in sources)
+                stats["reused"] += 1
+                continue
+                
+            # Reempaquetar la categoría
+            sprites_dir.mkdir(parents=True, exist_ok=True)
+            tmp = sprite_file.with_name(sprite_file.name + ".tmp")
+            offset, position = 0, 0.0
+            with open(tmp, 'wb') as out:
+                for relative, (digest, st) in sources.items():
+                    with open(self.output_dir / relative, 'rb') as f:
+                        data = f.read()
+                    info = mp3_info(data)
+                    if info is None:
+                        self.metrics.info(f"  ⚠️  {relative} no es un MP3 válido, no se incluye en el sprite")
+                        continue
+                    out.write(data[info.start:info.end])
+                    length = info.end - info.start
+                    clips[relative] = {
+                        "sprite": name,
+                        "offset": offset,
+                        "length": length,
+                        "start": round(position, 4),
+                        "duration": round(info.duration, 4),
+                        "hash": digest,
+                        "size": st.st_size,
+                        "mtime_ns": st.st_mtime_ns,
+                    }
+                    offset += length
+                    position += info.duration
+            os.replace(tmp, sprite_file)
+            sprites[name] = {
+                "file": f"{SPRITES_DIR}/{sprite_file.name}",
+                "category": category,
+                "bytes": offset,
+                "duration": round(position, 4),
+                "signature": signature,
+            }
+            stats["packed"] += 1
+            self.metrics.info(f"  📦 Sprite {sprite_file.name}: {len(sources)} clips, {offset / 1024:.0f} KB")
+            
+        # Eliminar sprites de categorías que ya no existen
+        for name, sprite in old_sprites.items():
+            if name not in sprites:
+                remove_if_exists(str(self.output_dir / sprite['file']))
+                stats["removed"] += 1
+                
+        if sprites or index:
+            sprites_dir.mkdir(parents=True, exist_ok=True)
+            tmp = index_path.with_name(index_path.name + ".tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({"version": 1, "sprites": sprites, "clips": dict(sorted(clips.items()))},
+                          f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, index_path)
+        return stats
+        
+    def build_asset_index(self) -> Dict[str, Any]:
+        """
+        Escribe el índice de assets (audio_index.json) del directorio de salida
+        
+        El índice contiene:
+          - assets: ruta relativa -> bytes, duración y hash del contenido
+          - cards: "<categoría>/<zhuyin>" o "tones/<número>" -> ruta de sound/word/sentence
+          - words: "<caracteres>|<pinyin>" -> ruta del audio de la palabra individual
+          - syllables: zhuyin con tono ("ㄇㄚˇ") -> clip del inventario de sílabas
+        Así script.js y show_statistics buscan cada clip en O(1) sin volver a
+        derivar rutas con sanitize_filename. Los hashes se reutilizan para
+        los archivos cuyo tamaño y fecha no cambiaron.
+        
+        Returns:
+            dict: El índice escrito
+        """
+        index_path = self.output_dir / ASSET_INDEX_NAME
+        previous = self.load_asset_index() or {}
+        old_assets = previous.get('assets', {})
+        
+        assets = {}
+        for category, entries in self.iter_output_clips():
+            for entry in entries:
+                relative = f"{category}/{entry.name}"
+                st = entry.stat()
+                prior = old_assets.get(relative)
+                if prior and prior.get('bytes') == st.st_size and prior.get('mtime_ns') == st.st_mtime_ns:
+                    assets[relative] = prior
+                    continue
+                with open(entry.path, 'rb') as f:
+                    data = f.read()
+                info = mp3_info(data)
+                assets[relative] = {
+                    "bytes": st.st_size,
+                    "duration": round(info.duration, 3) if info else None,
+                    "hash": hashlib.sha256(data).hexdigest()[:16],
+                    "mtime_ns": st.st_mtime_ns,
+                }
+                
+        cards: Dict[str, Dict[str, str]] = {}
+        words: Dict[str, str] = {}
+        
+        def register(path: Path) -> Optional[str]:
+            relative = Path(path).relative_to(self.output_dir).as_posix()
+            return relative if relative in assets else None
+            
+        if self.deck is not None:
+            for category in ('consonants', 'vowels'):
+                for card in self.deck.cards(category):
+                    paths = {
+                        "sound": register(self.zhuyin_sound_path(card)),
+                        "word": register(self.word_path(category, card)),
+                        "sentence": register(self.sentence_path(category, card)),
+                    }
+                    cards[f"{category}/{card['zhuyin']}"] = {k: v for k, v in paths.items() if v}
+                    for word in card['example_sentence']['words']:
+                        relative = register(self.individual_word_path(word))
+                        if relative:
+                            words[f"{word['characters']}|{word['pinyin']}"] = relative
+            for tone in self.deck.cards('tones'):
+                relative = register(self.tone_path(tone))
+                cards[f"tones/{tone['tone_number']}"] = {"word": relative} if relative else {}
+                
+        syllables: Dict[str, str] = {}
+        if any(relative.startswith(f"{SYLLABLES_DIR}/") for relative in assets):
+            for syllable in iter_syllables(tones=(1, 2, 3, 4, 5)):
+                relative = register(self.syllable_path(syllable))
+                if relative:
+                    syllables[syllable_zhuyin(syllable)] = relative
+                    
+        index = {"version": 1, "assets": assets, "cards": cards, "words": words, "syllables": syllables}
+        if assets or previous:
+            tmp = index_path.with_name(index_path.name + ".tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, index_path)
+        return index
+        
+    def load_asset_index(self) -> Optional[Dict[str, Any]]:
+        """Carga audio_index.json si existe (None si falta o está corrupto)"""
+        try:
+            with open(self.output_dir / ASSET_INDEX_NAME, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+            
+    def build_service_worker(self) -> Dict[str, int]:
+        """
+        Genera precache-manifest.json y sw.js junto a la aplicación web
+        
+        La aplicación es el directorio padre de output_dir (donde está
+        index.html). El manifiesto agrupa por prioridad: primero la interfaz
+        y los datos, luego los sprites (si existen, sustituyen a los clips de
+        sus categorías) y después los clips por categoría según
+        PRECACHE_PRIORITY. Los clips usan las mismas URL ?v=<hash> que pide
+        script.js, así que tras regenerar solo se descargan los que cambiaron.
+        
+        Returns:
+            dict: Número de grupos y de entradas del manifiesto
+        """
+        app_dir = self.output_dir.resolve().parent
+        prefix = f"{self.output_dir.resolve().name}/"
+        
+        def revision(path: Path) -> str:
+            with open(path, 'rb') as f:
+                return hashlib.sha256(f.read()).hexdigest()[:16]
+                
+        def entry(path: Path) -> Dict[str, str]:
+            return {"url": path.relative_to(app_dir).as_posix(), "revision": revision(path)}
+            
+        index = self.build_asset_index()
+        groups = []
+        
+        # Interfaz, datos e índices
+        shell = [app_dir / name for name in PRECACHE_SHELL]
+        data_file = Path(self.json_file).resolve()
+        if data_file.parent == app_dir:
+            shell.append(data_file)
+        shell += [self.output_dir.resolve() / ASSET_INDEX_NAME, self.output_dir.resolve() / SPRITES_DIR / SPRITE_INDEX_NAME]
+        groups.append({"name": "shell", "entries": [entry(path) for path in shell if path.is_file()]})
+        
+        # Sprites: cubren todos los clips de sus categorías
+        covered = set()
+        try:
+            with open(self.output_dir / SPRITES_DIR / SPRITE_INDEX_NAME, 'r', encoding='utf-8') as f:
+                sprites = json.load(f)['sprites']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            sprites = {}
+        if sprites:
+            groups.append({"name": SPRITES_DIR, "entries": [
+                {"url": prefix + sprite['file'], "revision": sprite['signature'][:16]} for sprite in sprites.values()
+            ]})
+            covered = {sprite['category'] for sprite in sprites.values()}
+            
+        # Clips individuales por categoría, en orden de prioridad
+        categories: Dict[str, List[Dict[str, str]]] = {}
+        for relative, asset in index['assets'].items():
+            category = relative.rsplit('/', 1)[0]
+            if category not in covered:
+                categories.setdefault(category, []).append(
+                    {"url": f"{prefix}{relative}?v={asset['hash']}", "revision": asset['hash']})
+        order = sorted(categories, key=lambda c: (PRECACHE_PRIORITY.index(c) if c in PRECACHE_PRIORITY else len(PRECACHE_PRIORITY), c))
+        groups += [{"name": category, "entries": categories[category]} for category in order]
+        
+        version = hashlib.sha256(json.dumps(groups, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        manifest = {"version": version, "groups": groups}
+        outputs = {
+            app_dir / PRECACHE_MANIFEST_NAME: json.dumps(manifest, ensure_ascii=False, separators=(',', ':')),
+            app_dir / SERVICE_WORKER_NAME: SERVICE_WORKER_TEMPLATE.replace('__VERSION__', version)
+                                                                  .replace('__MANIFEST__', PRECACHE_MANIFEST_NAME),
+        }
+        for path, content in outputs.items():
+            tmp = path.with_name(path.name + ".tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp, path)
+        return {"groups": len(groups), "entries": sum(len(g['entries']) for g in groups)}
+        
+    def postprocess_audios(self) -> Dict[str, int]:
+        """
+        Recorta silencios y normaliza el volumen de los clips (ffmpeg, pool de procesos)
+        
+        Los clips que comparten contenido (hard links del plan o de la caché)
+        se procesan una sola vez y se vuelven a enlazar. Se saltan los clips
+        cuyo hash de origen en el lockfile, tamaño y fecha no cambiaron desde
+        el último procesado con los mismos ajustes.
+        
+        Returns:
+            dict: Clips procesados, saltados y fallidos
+        """
+        stats = {"processed": 0, "skipped": 0, "failed": 0}
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            print("✗ Error: El postprocesado requiere ffmpeg instalado.")
+            stats["failed"] = -1
+            return stats
+            
+        settings = dict(self.postprocess_settings, ffmpeg=ffmpeg)
+        signature = SynthesisCache.make_key("postprocess", **self.postprocess_settings)
+        state_path = self.output_dir / POSTPROCESS_STATE_NAME
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            saved = {}
+        # Un estado por códec: mp3 (en el sitio) y opus (archivos hermanos) no se pisan
+        state = saved.get(settings['codec'], {})
+        lock = self.load_lockfile()
+        
+        # Agrupar por inodo: los hard links comparten un único procesado
+        groups: Dict[tuple, List[str]] = OrderedDict()
+        for category, entries in self.iter_output_clips():
+            for entry in entries:
+                relative = f"{category}/{entry.name}"
+                st = entry.stat()
+                source_hash = lock.entries.get(relative, {}).get('hash')
+                previous = state.get(relative)
+                if (previous and previous.get('settings') == signature and previous.get('source') == source_hash
+                        and previous.get('size') == st.st_size and previous.get('mtime_ns') == st.st_mtime_ns):
+                    stats["skipped"] += 1
+                    continue
+                groups.setdefault((st.st_dev, st.st_ino), []).append(relative)
+                
+        if groups:
+            self.metrics.info(f"🎚️  Postprocesando {sum(len(g) for g in groups.values())} clips "
+                              f"({len(groups)} únicos) en {self.postprocess_workers or os.cpu_count()} procesos...")
+        with ProcessPoolExecutor(max_workers=self.postprocess_workers or None) as pool:
+            futures = {pool.submit(postprocess_clip, str(self.output_dir / group[0]), settings): group
+                       for group in groups.values()}
+            for future in as_completed(futures):
+                group = futures[future]
+                result = future.result()
+                if "error" in result:
+                    stats["failed"] += len(group)
+                    self.metrics.emit("failed", file=result["source"], error=result["error"])
+                    continue
+                    
+                # Replicar el resultado a los demás nombres del grupo
+                for relative in group[1:]:
+                    target = self.output_dir / relative
+                    if result["output"] != result["source"]:
+                        target = target.with_suffix('.opus')
+                    link_or_copy(result["output"], str(target))
+                for relative in group:
+                    st = os.stat(self.output_dir / relative)
+                    state[relative] = {
+                        "settings": signature,
+                        "source": lock.entries.get(relative, {}).get('hash'),
+                        "size": st.st_size,
+                        "mtime_ns": st.st_mtime_ns,
+                    }
+                stats["processed"] += len(group)
+                self.metrics.info(f"  🎚️  {relative}: {result['before'] / 1024:.1f} KB → {result['after'] / 1024:.1f} KB")
+                
+        # Olvidar clips que ya no existen
+        existing = {f"{category}/{e.name}" for category, entries in self.iter_output_clips() for e in entries}
+        saved[settings['codec']] = {relative: entry for relative, entry in sorted(state.items()) if relative in existing}
+        tmp = state_path.with_name(state_path.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, state_path)
+        return stats
+        
+    def verify_audios(self) -> List[tuple]:
+        """
+        Busca clips vacíos, truncados o no decodificables (modo --verify)
+        
+        La comprobación se reparte en un pool de procesos. Los clips dañados
+        (y su entrada en la caché, que comparte contenido) se eliminan para
+        que la siguiente planificación los vuelva a encolar.
+        
+        Returns:
+            list: Pares (ruta relativa, problema) de los clips eliminados
+        """
+        paths = [entry.path for _, entries in self.iter_output_clips() for entry in entries]
+        self.metrics.info(f"🔎 Verificando {len(paths)} clips...")
+        with ProcessPoolExecutor() as pool:
+            problems = list(pool.map(verify_clip, paths, chunksize=32))
+            
+        lock = self.load_lockfile()
+        damaged = []
+        for path, problem in zip(paths, problems):
+            if problem is None:
+                continue
+            relative = self.lock_key(path)
+            damaged.append((relative, problem))
+            self.metrics.info(f"  ✗ {relative}: {problem}")
+            remove_if_exists(path)
+            entry = lock.entries.get(relative)
+            if entry is not None and self.cache is not None:
+                remove_if_exists(str(self.cache.path_for(entry['hash'])))
+        return damaged
+        
     def show_statistics(self):
-        """Muestra estadísticas de los archivos generados"""
+        """Muestra estadísticas de los archivos generados (desde audio_index.json si existe)"""
         print("\n📊 Estadísticas:")
         
-        for subdir in self.output_dir.rglob("*"):
-            if subdir.is_dir():
-                mp3_files = list(subdir.glob("*.mp3"))
-                if mp3_files:
-                    relative_path = subdir.relative_to(self.output_dir)
-                    print(f"  📂 {relative_path}: {len(mp3_files)} archivos")
+        index = self.load_asset_index()
+        if index is None:
+            for relative_path, mp3_files in self.iter_output_clips():
+                print(f"  📂 {relative_path}: {len(mp3_files)} archivos")
+            return
+            
+        categories: Dict[str, List[Dict[str, Any]]] = OrderedDict()
+        for relative, asset in index['assets'].items():
+            categories.setdefault(relative.rsplit('/', 1)[0], []).append(asset)
+        for relative_path, assets in categories.items():
+            size = sum(a['bytes'] for a in assets) / 1024
+            duration = sum(a['duration'] or 0 for a in assets)
+            print(f"  📂 {relative_path}: {len(assets)} archivos ({size:.0f} KB, {duration:.0f} s)")
                     
+    def show_cache_stats(self):
+        """Muestra el estado de la caché de síntesis (modo --cache-stats)"""
+        if self.cache is None:
+            print("La caché está desactivada.")
+            return
+        stats = self.cache.stats()
+        limit = f"{stats['max_bytes'] / 1024 / 1024:.0f} MB" if stats['max_bytes'] else "sin límite"
+        print("♻️  Caché de síntesis")
+        print(f"  📂 Directorio: {stats['directory']}")
+        print(f"  🎵 Entradas: {stats['entries']}")
+        print(f"  💾 Tamaño: {stats['bytes'] / 1024 / 1024:.1f} MB (límite: {limit})")
+        
+    def prune_cache(self):
+        """Desaloja entradas LRU hasta respetar el tamaño máximo (modo --cache-prune)"""
+        if self.cache is None:
+            print("La caché está desactivada.")
+            return
+        removed, freed = self.cache.prune()
+        print(f"🧹 Caché podada: {removed} entradas eliminadas, {freed / 1024 / 1024:.1f} MB liberados")
+        
     def clean_audio_files(self):
         """Limpia todos los archivos de audio generados"""
         if not self.output_dir.exists():
@@ -440,28 +3481,611 @@ class ZhuyinAudioGenerator:
             print("Operación cancelada.")
 
 
+class BenchmarkRecorder:
+    """
+    Acumula tiempos por clip durante una etapa del benchmark
+
+    Separa el tiempo de síntesis (llamadas al backend) del tiempo de
+    sistema de archivos (escritura, enlaces y caché).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.totals = {"synthesis": 0.0, "filesystem": 0.0}
+            self.counts = {"synthesis": 0, "filesystem": 0}
+            self.clip_latencies: List[float] = []
+
+    def add(self, kind: str, seconds: float):
+        with self.lock:
+            self.totals[kind] += seconds
+            self.counts[kind] += 1
+
+    def clip(self, seconds: float):
+        with self.lock:
+            self.clip_latencies.append(seconds)
+
+
+def check_rate_cap(requests_made: int, seconds: float, rate: Optional[float]) -> Optional[bool]:
+    """
+    Comprueba que una etapa no superó --rate (None si no hay límite)
+    
+    Un token bucket que empieza con un token permite como mucho
+    1 + rate × segundos requests en ese intervalo.
+    """
+    if not rate:
+        return None
+    return requests_made <= 1 + rate * seconds
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentil por el método del rango más cercano (values ordenados)"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Pico de memoria residente del proceso en MB (None si no está disponible)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo devuelve en KB y macOS en bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def reset_stage_peak_rss() -> bool:
+    """
+    Reinicia el pico de memoria residente (VmHWM) del proceso
+    
+    Solo en Linux (escribe 5 en /proc/self/clear_refs); devuelve False si
+    no se puede, y entonces no hay medida por etapa.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def stage_peak_rss_mb() -> Optional[float]:
+    """Pico de memoria residente en MB desde el último reset_stage_peak_rss (VmHWM)"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def run_profiled(function, *args, mode: str = "cpu", top: int = 25, output: Optional[str] = None):
+    """
+    Ejecuta function(*args) bajo cProfile o tracemalloc e imprime un informe
+    
+    Args:
+        function: Función a perfilar (normalmente run_cli)
+        mode: 'cpu' (funciones con más tiempo propio y acumulado) o 'memory'
+            (líneas que más memoria asignaron y pico de la ejecución)
+        top: Entradas a mostrar
+        output: Archivo donde guardar el perfil completo (pstats para cpu,
+            snapshot de tracemalloc para memory)
+    """
+    # Tiempo de CPU consumido antes de llegar aquí: intérprete + imports del módulo
+    startup = time.process_time()
+    start = time.perf_counter()
+    if mode == "memory":
+        import tracemalloc
+        tracemalloc.start(10)
+        try:
+            function(*args)
+        finally:
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ])
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"\n🧪 Perfil de memoria ({time.perf_counter() - start:.2f} s, arranque {startup * 1000:.0f} ms de CPU)")
+            print(f"  Pico: {peak / 1024 / 1024:.1f} MB, retenido al terminar: {current / 1024 / 1024:.1f} MB")
+            for stat in snapshot.statistics('lineno')[:top]:
+                frame = stat.traceback[0]
+                print(f"  {stat.size / 1024:>9.1f} KB  {stat.count:>7} bloques  {frame.filename}:{frame.lineno}")
+            if output:
+                snapshot.dump(output)
+                print(f"💾 Snapshot guardado en {output}")
+        return
+        
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(function, *args)
+    finally:
+        print(f"\n🧪 Perfil de CPU ({time.perf_counter() - start:.2f} s, arranque {startup * 1000:.0f} ms de CPU)")
+        stats = pstats.Stats(profiler, stream=sys.stdout).strip_dirs()
+        print("  Por tiempo propio:")
+        stats.sort_stats("tottime").print_stats(top)
+        print("  Por tiempo acumulado:")
+        stats.sort_stats("cumulative").print_stats(top)
+        if output:
+            profiler.dump_stats(output)
+            print(f"💾 Perfil guardado en {output} (ábrelo con pstats o snakeviz)")
+
+
+def scale_deck(data: Dict[str, Any], factor: int) -> Dict[str, Any]:
+    """
+    Construye un mazo sintético factor veces mayor que data
+
+    Cada copia añade un sufijo numérico a textos y pinyin para que genere
+    archivos y textos distintos, conservando la proporción de palabras
+    repetidas dentro de cada copia.
+    """
+    system = data['zhuyin_system']
+    scaled = {category: [] for category in system}
+    
+    def variant(entry: Dict[str, Any], suffix: str) -> Dict[str, Any]:
+        entry = dict(entry, characters=f"{entry['characters']}{suffix}")
+        if 'pinyin' in entry:
+            entry['pinyin'] = f"{entry['pinyin']}{suffix}"
+        return entry
+    
+    for copy in range(factor):
+        suffix = str(copy) if copy else ""
+        for category in ('consonants', 'vowels'):
+            for card in system.get(category, []):
+                sentence = card['example_sentence']
+                scaled[category].append(dict(
+                    card,
+                    pinyin=f"{card['pinyin']}{suffix}",
+                    example_word=variant(card['example_word'], suffix),
+                    example_sentence=dict(
+                        sentence,
+                        characters=f"{suffix}{sentence['characters']}",
+                        words=[variant(word, suffix) for word in sentence['words']],
+                    ),
+                ))
+        for tone in system.get('tones', []):
+            scaled['tones'].append(dict(tone, example=variant(tone['example'], suffix)))
+    return dict(data, zhuyin_system=scaled)
+
+
+def run_benchmark(generator: 'ZhuyinAudioGenerator', scales: List[int], output: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Ejecuta el pipeline por etapas sobre mazos sintéticos escalados
+    
+    Usa el backend y la concurrencia configurados en generator (el fake con
+    --fake-latency: run_cli sustituye los backends de red) en un directorio
+    temporal y sin caché. stage_peak_rss_mb es el pico de cada etapa;
+    process_peak_rss_mb, el máximo del proceso hasta el final de la escala.
+    
+    Args:
+        generator: Generador con los datos ya cargados
+        scales: Factores de escala del mazo (p. ej. [10, 100, 1000])
+        output: Archivo donde guardar el informe JSON (None = stdout)
+    
+    Returns:
+        dict: Informe del benchmark
+    """
+    import platform
+    import tempfile
+    
+    base_data = generator.deck.to_data()
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": {"name": generator.backend.name, "latency": getattr(generator.backend, 'latency', None)},
+        "workers": generator.workers,
+        "rate": generator.rate,
+        "runs": [],
+    }
+    
+    for factor in scales:
+        with tempfile.TemporaryDirectory(prefix="zhuyin_bench_") as tmp:
+            bench = ZhuyinAudioGenerator(generator.json_file, tmp)
+            bench.deck = DeckSource.from_data(scale_deck(base_data, factor))
+            bench.backend = generator.backend
+            bench.workers = generator.workers
+            bench.rate = generator.rate
+            # Sin cuota real (backends locales): solo limita --rate
+            bench.delay = generator.delay if generator.backend.requires_network else 0
+            bench.cache = None
+            bench.recorder = BenchmarkRecorder()
+            bench.metrics = GenerationMetrics(quiet=True)
+            
+            print(f"⏱️  Benchmark ×{factor}...", file=sys.stderr)
+            stages = []
+            run_start = time.perf_counter()
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                for name, clips in bench.pipeline_stages():
+                    bench.recorder.reset()
+                    measured = reset_stage_peak_rss()
+                    stage_start = time.perf_counter()
+                    plan = bench.build_plan(clips=clips)
+                    plan_seconds = time.perf_counter() - stage_start
+                    with bench.worker_pool():
+                        bench.execute_plan(plan)
+                    wall = time.perf_counter() - stage_start
+                    
+                    latencies = sorted(bench.recorder.clip_latencies)
+                    requests_made = bench.recorder.counts["synthesis"]
+                    stages.append({
+                        "stage": name,
+                        "clips": len(plan.targets),
+                        "jobs": len(plan.jobs),
+                        "wall_seconds": round(wall, 4),
+                        "plan_seconds": round(plan_seconds, 4),
+                        "clips_per_second": round(len(plan.targets) / wall, 2) if wall else None,
+                        "latency_ms": {
+                            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+                            "p95": round(percentile(latencies, 0.95) * 1000, 3),
+                            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+                        },
+                        "synthesis_seconds": round(bench.recorder.totals["synthesis"], 4),
+                        "filesystem_seconds": round(bench.recorder.totals["filesystem"], 4),
+                        "requests": requests_made,
+                        "requests_per_second": round(requests_made / wall, 2) if wall else None,
+                        "rate_ok": check_rate_cap(requests_made, wall, bench.rate),
+                        # Pico de esta etapa (None si la plataforma no permite reiniciarlo)
+                        "stage_peak_rss_mb": stage_peak_rss_mb() if measured else None,
+                    })
+            wall = time.perf_counter() - run_start
+            clips = sum(stage["clips"] for stage in stages)
+            report["runs"].append({
+                "scale": factor,
+                "clips": clips,
+                "wall_seconds": round(wall, 4),
+                "clips_per_second": round(clips / wall, 2) if wall else None,
+                "process_peak_rss_mb": peak_rss_mb(),
+                "stages": stages,
+            })
+            
+    report["rate_ok"] = all(stage["rate_ok"] is not False for run in report["runs"] for stage in run["stages"])
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+        print(f"📊 Informe de benchmark guardado en {output}", file=sys.stderr)
+    else:
+        print(text)
+    return report
+
+
+# Configuración que los mazos de un lote heredan del generador principal
+BATCH_SHARED_SETTINGS = ("delay", "workers", "rate", "slow", "backend", "cache", "max_retries",
+                         "backoff", "backoff_max", "breaker", "metrics",
+                         "postprocess_settings", "postprocess_workers")
+
+
+def find_decks(source: str) -> List[str]:
+    """Mazos de un directorio (*.json y *.jsonl) o que coinciden con un patrón glob"""
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, "*.json")) + glob.glob(os.path.join(source, "*.jsonl"))
+    else:
+        paths = glob.glob(source)
+    return sorted(paths)
+
+
+def run_batch(generator: 'ZhuyinAudioGenerator', source: str, incremental: bool = False,
+              dry_run: bool = False) -> Optional[List['ZhuyinAudioGenerator']]:
+    """
+    Genera los audios de varios mazos en un solo proceso (modo --batch)
+    
+    Cada mazo se planifica en su propio árbol <output>/<nombre del mazo>/ con
+    su lockfile e índice, pero todos se ejecutan como un único plan: un texto
+    presente en varios mazos se sintetiza una vez y se enlaza al resto, y
+    todos comparten el pool de hilos, el limitador y la caché de generator.
+    
+    Args:
+        generator: Generador con la configuración (backend, caché, concurrencia)
+        source: Directorio o patrón glob con los mazos
+        incremental: Aplicar el lockfile de cada mazo (--incremental)
+        dry_run: Solo mostrar el plan combinado (--plan)
+    
+    Returns:
+        list: Generadores de cada mazo procesado (None si no se pudo ejecutar)
+    """
+    paths = find_decks(source)
+    if not paths:
+        print(f"✗ Error: No se encontraron mazos en {source}")
+        return None
+        
+    start_time = time.time()
+    generator.metrics.info(f"📚 Modo lote: {len(paths)} mazos → {generator.output_dir}/<mazo>/")
+    
+    # Planificar cada mazo en su propio árbol de salida
+    decks = []
+    for path in paths:
+        name = Path(path).stem
+        if any(deck.output_dir.name == name for deck, _, _ in decks):
+            name = Path(path).name.replace('.', '_')
+        deck = ZhuyinAudioGenerator(path, str(generator.output_dir / name))
+        for setting in BATCH_SHARED_SETTINGS:
+            setattr(deck, setting, getattr(generator, setting))
+        if not deck.load_data():
+            print(f"  ⚠️  Se omite el mazo {path}")
+            continue
+        plan = deck.build_plan()
+        lock = deck.load_lockfile()
+        if incremental:
+            stale, orphans = deck.apply_incremental(plan, lock, dry_run=dry_run)
+            generator.metrics.info(f"  🔄 {name}: {stale} clips obsoletos, {orphans} huérfanos")
+        decks.append((deck, plan, lock))
+    if not decks:
+        return None
+        
+    # Plan combinado: los textos repetidos entre mazos son un único trabajo
+    combined = JobPlan()
+    for deck, plan, _ in decks:
+        for filename, job in plan.targets.items():
+            combined.add(job.text, job.lang, filename, job.existing[filename])
+    combined.total_entries = sum(plan.total_entries for _, plan, _ in decks)
+    shared = sum(len(plan.jobs) for _, plan, _ in decks) - len(combined.jobs)
+    
+    if dry_run or not generator.metrics.quiet:
+        generator.print_plan(combined)
+        print(f"🔁 Textos compartidos entre mazos: {shared}")
+    if dry_run:
+        return [deck for deck, _, _ in decks]
+        
+    if not generator.check_backend_ready():
+        return None
+        
+    regenerated = {t for job in combined.jobs.values() for t in job.missing_targets()}
+    try:
+        generator.metrics.start_progress(len(combined.targets))
+        try:
+            with generator.worker_pool():
+                generator.execute_plan(combined)
+        finally:
+            generator.metrics.stop_progress()
+            for deck, plan, lock in decks:
+                deck.update_lockfile(plan, lock, regenerated)
+    except KeyboardInterrupt:
+        print("\n⏹️  Generación interrumpida por el usuario")
+        return None
+        
+    # Resumen combinado
+    print(f"\n📚 Resumen del lote ({time.time() - start_time:.1f} segundos)")
+    print("=" * 60)
+    failed_total = 0
+    for deck, plan, _ in decks:
+        deck.build_asset_index()
+        present = OutputSnapshot(deck.output_dir)
+        failed = sum(1 for filename in plan.targets if not present.exists(filename))
+        created = sum(1 for filename in plan.targets if filename in regenerated) - failed
+        failed_total += failed
+        print(f"  📄 {deck.json_file}: {plan.total_entries} clips, {len(plan.targets)} archivos "
+              f"({created} nuevos, {failed} fallidos) → {deck.output_dir}")
+    print(f"🔤 Textos únicos en el lote: {len(combined.jobs)} ({shared} compartidos entre mazos)")
+    if generator.cache is not None:
+        print(f"♻️  Caché: {generator.cache.hits} aciertos, {generator.cache.misses} síntesis nuevas")
+    if failed_total:
+        print(f"\n⚠️  {failed_total} clips fallaron tras {generator.max_retries} reintentos; vuelve a ejecutar el lote para reintentarlos")
+    return [deck for deck, _, _ in decks]
+
+
 def main():
     """Función principal"""
     import argparse
     
     parser = argparse.ArgumentParser(description="Generador de audios para Zhuyin/Bopomofo - VERSIÓN DEFINITIVA")
-    parser.add_argument("--json", default="zhuyin_data.json", help="Archivo JSON con datos de zhuyin")
+    parser.add_argument("--batch", metavar="RUTA", help="Generar varios mazos (directorio o patrón glob) en <output>/<mazo>/ con pool y caché compartidos")
+    parser.add_argument("--json", default="zhuyin_data.json", help="Mazo con datos de zhuyin (.json o .jsonl, una tarjeta por línea con \"category\")")
     parser.add_argument("--output", default="zhuyin_audios", help="Directorio de salida para audios")
     parser.add_argument("--clean", action="store_true", help="Limpiar archivos de audio existentes")
     parser.add_argument("--delay", type=float, default=1.0, help="Delay entre requests (segundos)")
+    parser.add_argument("--workers", type=int, default=1, help="Número de hilos de síntesis concurrentes")
+    parser.add_argument("--rate", type=float, default=None, help="Máximo de requests por segundo (token bucket compartido)")
     parser.add_argument("--fix-vowels", action="store_true", help="Regenerar solo los sonidos de vocales")
     parser.add_argument("--fix-consonants", action="store_true", help="Regenerar solo los sonidos de consonantes (corrige ㄒ, ㄑ, ㄐ, ㄖ)")
+    parser.add_argument("--backend", choices=sorted(TTS_BACKENDS), default="gtts", help="Motor de síntesis: gtts (red), gtts-async (red, conexiones persistentes; requiere aiohttp), espeak (local) o fake (sintético, sin red)")
+    parser.add_argument("--tts-endpoint", metavar="URL", help="Endpoint alternativo para gtts-async (p. ej. un servidor de pruebas local)")
+    parser.add_argument("--fake-latency", type=float, default=0.0, help="Latencia simulada por síntesis del backend fake (segundos)")
+    parser.add_argument("--fake-failure-rate", type=float, default=0.0, help="Probabilidad de fallo por síntesis del backend fake (0-1)")
+    parser.add_argument("--fake-seed", type=int, default=0, help="Semilla de los fallos del backend fake")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directorio de la caché de síntesis")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_CACHE_MAX_MB, help="Tamaño máximo de la caché en MB (0 = sin límite)")
+    parser.add_argument("--no-cache", action="store_true", help="No usar la caché de síntesis")
+    parser.add_argument("--cache-stats", action="store_true", help="Mostrar estadísticas de la caché de síntesis")
+    parser.add_argument("--cache-prune", action="store_true", help="Desalojar entradas antiguas hasta respetar --cache-max-mb")
+    parser.add_argument("--incremental", action="store_true", help="Regenerar solo clips nuevos o modificados según el lockfile y borrar huérfanos")
+    parser.add_argument("--resume", action="store_true", help="Continuar una generación interrumpida según el diario de trabajos")
+    parser.add_argument("--retries", type=int, default=3, help="Reintentos por clip ante errores del proveedor")
+    parser.add_argument("--backoff", type=float, default=1.0, help="Espera base (segundos) del backoff exponencial entre reintentos")
+    parser.add_argument("--breaker-threshold", type=float, default=0.5, help="Proporción de errores recientes que pausa todo el pool")
+    parser.add_argument("--breaker-cooldown", type=float, default=30.0, help="Segundos de pausa cuando se abre el circuit breaker")
+    parser.add_argument("--benchmark", action="store_true", help="Medir el pipeline por etapas sobre mazos sintéticos escalados (backend fake con --fake-latency; nunca usa la red)")
+    parser.add_argument("--benchmark-scales", default="10,100,1000", help="Factores de escala del mazo para --benchmark, separados por comas")
+    parser.add_argument("--benchmark-output", default=None, help="Archivo JSON donde guardar el informe de --benchmark (por defecto stdout)")
+    parser.add_argument("--quiet", action="store_true", help="No mostrar progreso por clip (solo errores y resumen final)")
+    parser.add_argument("--progress", action="store_true", help="Mostrar una barra de progreso con ETA en lugar de una línea por clip")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar también los mensajes DEBUG de asignación de vocales")
+    parser.add_argument("--events-file", default=None, help="Registrar todos los eventos de la generación en este archivo JSON lines")
+    parser.add_argument("--metrics-file", default=None, help="Exportar métricas al terminar (.prom/.txt = formato Prometheus, otro = JSON)")
+    parser.add_argument("--postprocess", action="store_true", help="Recortar silencios y normalizar volumen (ffmpeg) al terminar la generación")
+    parser.add_argument("--postprocess-only", action="store_true", help="Solo postprocesar los clips existentes, sin sintetizar")
+    parser.add_argument("--pp-codec", choices=["mp3", "opus"], default="mp3", help="Códec del postprocesado (opus escribe archivos .opus junto a los .mp3)")
+    parser.add_argument("--pp-bitrate", default="48k", help="Bitrate del postprocesado (p. ej. 48k)")
+    parser.add_argument("--pp-loudness", type=float, default=-16.0, help="Volumen objetivo en LUFS")
+    parser.add_argument("--pp-silence-db", type=float, default=-50.0, help="Umbral de silencio en dB para el recorte")
+    parser.add_argument("--pp-workers", type=int, default=None, help="Procesos del postprocesado (por defecto uno por núcleo)")
+    parser.add_argument("--service-worker", action="store_true", help="Generar sw.js y precache-manifest.json para uso offline de la web")
+    parser.add_argument("--service-worker-only", action="store_true", help="Solo regenerar el service worker y su manifiesto")
+    parser.add_argument("--index-only", action="store_true", help="Solo reconstruir el índice de assets (audio_index.json)")
+    parser.add_argument("--sprites", action="store_true", help="Empaquetar los clips en sprites por categoría al terminar la generación")
+    parser.add_argument("--sprites-only", action="store_true", help="Solo (re)empaquetar los sprites de audio, sin sintetizar")
+    parser.add_argument("--pack", action="store_true", help="Empaquetar los audios en un único archivo indexado al terminar la generación")
+    parser.add_argument("--pack-only", action="store_true", help="Solo empaquetar los audios existentes, sin sintetizar")
+    parser.add_argument("--pack-file", default=None, help=f"Ruta del archivo empaquetado (por defecto <output>{ARCHIVE_SUFFIX})")
+    parser.add_argument("--pack-list", action="store_true", help="Listar el contenido del archivo empaquetado")
+    parser.add_argument("--pack-extract", action="store_true", help="Extraer el archivo empaquetado en el directorio de salida")
+    parser.add_argument("--pack-serve", action="store_true", help="Servir los clips del archivo empaquetado por HTTP (prueba local)")
+    parser.add_argument("--pack-port", type=int, default=8000, help="Puerto de --pack-serve")
+    parser.add_argument("--verify", action="store_true", help="Detectar clips vacíos o no decodificables, eliminarlos y regenerarlos")
+    parser.add_argument("--fsync-batch", type=int, default=64, help="Escrituras por cada fsync en bloque de directorios (0 = sin fsync)")
+    parser.add_argument("--syllables", action="store_true", help="Generar el inventario completo de sílabas × tonos en syllables/")
+    parser.add_argument("--syllable-tones", default="1,2,3,4", help="Tonos del inventario de sílabas (5 = neutro)")
+    parser.add_argument("--compose", action="store_true",
+                        help="Componer palabras y frases concatenando audio de sílabas (con sandhi tonal)")
+    parser.add_argument("--compose-gap", type=float, default=0.08, help="Silencio entre palabras al componer frases (segundos)")
+    parser.add_argument("--compose-crossfade", type=float, default=0.03,
+                        help="Fundido entre sílabas con ffmpeg al componer (segundos, 0 = sin fundido)")
+    parser.add_argument("--plan", action="store_true", help="Mostrar el plan de generación (trabajos, duplicados, tiempo estimado) sin sintetizar")
     parser.add_argument("--test-mapping", action="store_true", help="Probar asignación de vocales sin generar audios (modo debug)")
     
+    parser.add_argument("--profile", choices=["cpu", "memory"], default=None,
+                        help="Perfilar el modo elegido: cpu (cProfile, funciones más costosas) o memory (tracemalloc, puntos de asignación)")
+    parser.add_argument("--profile-top", type=int, default=25, help="Entradas a mostrar en el informe de --profile")
+    parser.add_argument("--profile-output", default=None, help="Guardar el perfil completo (pstats o snapshot de tracemalloc) en este archivo")
+    
     args = parser.parse_args()
     
+    if args.profile:
+        run_profiled(run_cli, args, mode=args.profile, top=args.profile_top, output=args.profile_output)
+    else:
+        run_cli(args)
+
+
+def run_cli(args):
+    """Ejecuta el modo de la línea de comandos seleccionado en args"""
     generator = ZhuyinAudioGenerator(args.json, args.output)
     generator.delay = args.delay
+    generator.workers = max(1, args.workers)
+    generator.rate = args.rate
+    if args.backend == "fake":
+        generator.backend = FakeBackend(args.fake_latency, args.fake_failure_rate, args.fake_seed)
+    elif args.backend == "gtts-async":
+        generator.backend = GTTSAsyncBackend(endpoint=args.tts_endpoint, connections=generator.workers)
+    else:
+        generator.backend = TTS_BACKENDS[args.backend]()
+    generator.metrics = GenerationMetrics(quiet=args.quiet, progress=args.progress,
+                                          debug=args.verbose or args.test_mapping, events_file=args.events_file)
+    generator.max_retries = max(0, args.retries)
+    generator.backoff = args.backoff
+    generator.breaker = CircuitBreaker(args.breaker_threshold, cooldown=args.breaker_cooldown)
+    generator.postprocess_settings = {"codec": args.pp_codec, "bitrate": args.pp_bitrate,
+                                      "loudness": args.pp_loudness, "silence_db": args.pp_silence_db}
+    generator.postprocess_workers = args.pp_workers
+    generator.writer = AtomicWriter(max(0, args.fsync_batch))
+    if args.no_cache:
+        generator.cache = None
+    else:
+        generator.cache = SynthesisCache(args.cache_dir, int(args.cache_max_mb * 1024 * 1024))
     
     if args.clean:
         generator.clean_audio_files()
         return
         
+    if args.cache_stats:
+        generator.show_cache_stats()
+        return
+        
+    if args.cache_prune:
+        generator.prune_cache()
+        return
+        
+    if args.benchmark:
+        # Los mazos escalados generan miles de síntesis: nunca se envían a un servicio de red
+        if generator.backend.requires_network:
+            print(f"ℹ️  --benchmark no usa la red: se sustituye {generator.backend.name} por el backend fake "
+                  f"(--fake-latency {args.fake_latency:g} s)", file=sys.stderr)
+            generator.backend = FakeBackend(args.fake_latency, args.fake_failure_rate, args.fake_seed)
+        # stdout queda solo para el informe JSON: los mensajes van a stderr
+        with redirect_stdout(sys.stderr):
+            loaded = generator.load_data() and generator.check_backend_ready()
+        if loaded:
+            scales = [int(scale) for scale in args.benchmark_scales.split(",") if scale.strip()]
+            report = run_benchmark(generator, scales, args.benchmark_output)
+            if not report["rate_ok"]:
+                print(f"✗ El benchmark superó el límite de {generator.rate} requests/s", file=sys.stderr)
+                sys.exit(1)
+        return
+        
+    if args.postprocess_only:
+        stats = generator.postprocess_audios()
+        if stats["failed"] >= 0:
+            print(f"🎚️  Postprocesado: {stats['processed']} clips, {stats['skipped']} sin cambios, {stats['failed']} fallidos")
+            generator.load_data()
+            generator.build_asset_index()
+        return
+        
+    if args.index_only:
+        if generator.load_data():
+            index = generator.build_asset_index()
+            print(f"🗂️  Índice: {len(index['assets'])} clips, {len(index['cards'])} tarjetas, {len(index['words'])} palabras")
+        return
+        
+    if args.service_worker_only:
+        if generator.load_data():
+            stats = generator.build_service_worker()
+            print(f"📴 Service worker: {stats['entries']} recursos en {stats['groups']} grupos de precarga")
+        return
+        
+    if args.sprites_only:
+        stats = generator.build_sprites()
+        print(f"📦 Sprites: {stats['packed']} reempaquetados, {stats['reused']} sin cambios, {stats['removed']} eliminados")
+        return
+        
+    if args.pack_only:
+        stats = generator.build_archive(args.pack_file)
+        print(f"🗜️  Archivo: {stats['keys']} clips ({stats['unique']} únicos), {stats['bytes'] / 1024:.1f} KB en {stats['path']}")
+        return
+        
+    if args.pack_list or args.pack_extract or args.pack_serve:
+        path = args.pack_file or generator.archive_path()
+        try:
+            if args.pack_serve:
+                serve_audio_archive(path, port=args.pack_port)
+                return
+            with AudioArchive(path) as archive:
+                if args.pack_extract:
+                    count = archive.extract(generator.output_dir)
+                    print(f"📤 {count} archivos extraídos en {generator.output_dir}")
+                    return
+                total = 0
+                for key, entry in archive.entries.items():
+                    print(f"  {entry.size:>8}  {entry.hash}  {key}")
+                    total += entry.size
+                print(f"🗜️  {len(archive)} clips, {total / 1024:.1f} KB ({os.path.getsize(path) / 1024:.1f} KB en disco)")
+        except (FileNotFoundError, ArchiveFormatError) as e:
+            print(f"✗ No se puede leer el archivo empaquetado: {e}")
+        return
+        
+    if args.verify:
+        damaged = generator.verify_audios()
+        print(f"🔎 Verificación: {len(damaged)} clips dañados eliminados")
+        if not damaged:
+            return
+        # Continúa con la generación normal, que vuelve a encolar los eliminados
+        
+    tones = tuple(int(tone) for tone in args.syllable_tones.split(",") if tone.strip())
+    if args.syllables and args.plan:
+        generator.generate_syllables(tones, dry_run=True)
+        return
+        
+    if args.batch and args.plan:
+        run_batch(generator, args.batch, incremental=args.incremental, dry_run=True)
+        return
+        
+    if args.plan:
+        if generator.load_data():
+            plan = generator.build_plan()
+            if args.incremental:
+                stale, orphans = generator.apply_incremental(plan, generator.load_lockfile(), dry_run=True)
+                print(f"🔄 Modo incremental: {stale} clips obsoletos, {orphans} huérfanos")
+            generator.print_plan(plan)
+        return
+        
     if args.test_mapping:
         success = generator.test_consonant_vowel_mapping()
         if success:
@@ -493,9 +4117,45 @@ def main():
             print("\n✗ Error al regenerar las consonantes.")
         return
         
-    success = generator.generate_all_audios()
+    if args.batch:
+        decks = run_batch(generator, args.batch, incremental=args.incremental)
+        success = decks is not None
+    elif args.syllables:
+        success = generator.generate_syllables(tones)
+        decks = [generator]
+    elif args.compose:
+        success = generator.compose_audios(gap=args.compose_gap, crossfade=args.compose_crossfade,
+                                           incremental=args.incremental)
+        decks = [generator]
+    else:
+        success = generator.generate_all_audios(incremental=args.incremental, resume=args.resume)
+        decks = [generator]
+    for deck in (decks if success else []):
+        if args.postprocess:
+            stats = deck.postprocess_audios()
+            if stats["failed"] >= 0:
+                print(f"🎚️  Postprocesado: {stats['processed']} clips, {stats['skipped']} sin cambios, {stats['failed']} fallidos")
+                deck.build_asset_index()
+        if args.sprites:
+            stats = deck.build_sprites()
+            print(f"📦 Sprites: {stats['packed']} reempaquetados, {stats['reused']} sin cambios, {stats['removed']} eliminados")
+        if args.pack:
+            stats = deck.build_archive(None if args.batch else args.pack_file)
+            print(f"🗜️  Archivo: {stats['keys']} clips ({stats['unique']} únicos), {stats['bytes'] / 1024:.1f} KB en {stats['path']}")
+    if success and args.service_worker and args.batch:
+        print("⚠️  --service-worker no se aplica en modo lote: usa --service-worker-only con la salida de la web")
+    elif success and args.service_worker:
+        stats = generator.build_service_worker()
+        print(f"📴 Service worker: {stats['entries']} recursos en {stats['groups']} grupos de precarga")
+    generator.backend.close()
+    generator.metrics.close()
+    if args.metrics_file:
+        generator.metrics.write(args.metrics_file)
+        print(f"📈 Métricas exportadas a {args.metrics_file}")
     
-    if success:
+    if success and args.quiet:
+        print("\n🎉 ¡Proceso completado exitosamente!")
+    elif success:
         print("\n🎉 ¡Proceso completado exitosamente!")
         print("\n📖 Cómo usar los audios:")
         print("  • consonants/words/: Palabras ejemplo para cada consonante")